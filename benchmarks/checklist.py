@@ -0,0 +1,85 @@
+"""Micro-benchmark of the per-question cost of coderunner.checklist checks.
+
+Cycles the CodeRunner questions of an XML file (default: unittest.xml) to N
+questions and times the check loop (every setting of every question, as
+check does, without fixes) and _clean_html. A baseline checklist.py (e.g. an
+earlier revision, extracted with git show) can be timed for comparison.
+
+    python benchmarks/checklist.py [-n N] [-f FILE] [-b BASELINE]
+"""
+
+import importlib.util
+import os
+import time
+import xml.etree.ElementTree as ET
+
+CODERUNNER = os.path.join(os.path.dirname(__file__), '..', 'src',
+                          'coderunner')
+
+
+def load(path, name):
+    """Imports the checklist module from path."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def check_loop(module, questions):
+    """Checks every setting of every question, as checklist.check."""
+    if not hasattr(module, '_compile'):  # Before the compiled plan.
+        for question in questions:
+            for child in question:
+                module._check_setting(question, child.tag,
+                                      module.DEFAULTS.get(child.tag, []))
+        return
+
+    plan = {}
+    for question in questions:
+        for child in question:
+            if (step := plan.get(child.tag)) is None:
+                step = plan[child.tag] = module._compile(
+                    child.tag, module.DEFAULTS.get(child.tag, []))
+            step[0](question)
+
+
+def main():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('-n', '--questions', type=int, default=100_000)
+    parser.add_argument('-f', '--file',
+                        default=os.path.join(CODERUNNER, 'unittest.xml'))
+    parser.add_argument('-b', '--baseline',
+                        help='checklist.py to be timed for comparison.')
+    args = parser.parse_args()
+
+    modules = [('current', os.path.join(CODERUNNER, 'checklist.py'))]
+    if args.baseline:
+        modules.insert(0, ('baseline', args.baseline))
+    for label, path in modules:
+        module = load(path, f'checklist_{label}')
+        questions = [question for _, _, question
+                     in module._coderunner_questions(args.file)]
+        for question in questions:  # The checks assume the tags element.
+            if question.find('tags') is None:
+                question.append(ET.Element('tags'))
+        texts = [question.findtext('questiontext/text').strip()
+                 for question in questions]
+        n = args.questions
+
+        start = time.perf_counter()
+        check_loop(module, [questions[i % len(questions)] for i in range(n)])
+        check = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(n):
+            module._clean_html(texts[i % len(texts)])
+        clean = time.perf_counter() - start
+        print(f'{label}: check {check:.2f}s ({1e6 * check / n:.1f} '
+              f'us/question), _clean_html {clean:.2f}s '
+              f'({1e6 * clean / n:.1f} us/question)')
+
+
+if __name__ == '__main__':
+    main()
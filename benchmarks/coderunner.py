@@ -0,0 +1,56 @@
+"""Benchmark of cold (coderunner.runner.execute) vs warm (Worker) runs.
+
+Times N runs of a trivial program and of the python3_try_except prototype
+rendered with a small answer and T test cases, each run in a new
+interpreter (execute) and forked from a pre-started worker (Worker). Where
+warm workers are not supported (see runner.WARM), both run cold.
+
+    python benchmarks/coderunner.py [-n N] [-t T]
+"""
+
+import os
+import sys
+import time
+
+CODERUNNER = os.path.join(os.path.dirname(__file__), '..', 'src',
+                          'coderunner')
+sys.path.insert(0, CODERUNNER)
+
+import runner  # noqa: E402
+
+
+def programs(tests):
+    """Returns a dictionary {label: code} of the programs to be run."""
+    template = runner.prototypes(os.path.join(
+        CODERUNNER, 'python3_try_except.xml'))['python3_try_except']
+    code = runner.render(template['template'], {
+        'STUDENT_ANSWER': 'def f(x):\n    return 2 * x\n',
+        'TESTCASES': [{'testcode': f'print(f({i}))'} for i in range(tests)]})
+    return {'pass': 'pass', f'try_except {tests} tests': code}
+
+
+def main():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('-n', '--runs', type=int, default=200)
+    parser.add_argument('-t', '--tests', type=int, default=10)
+    args = parser.parse_args()
+
+    if not runner.WARM:
+        print('Warm workers not supported: both run cold.')
+    with runner.Worker() as worker:
+        for name, code in programs(args.tests).items():
+            for label, execute in (('cold', runner.execute),
+                                   ('warm', worker.execute)):
+                execute(code)  # Warm-up.
+                start = time.perf_counter()
+                for _ in range(args.runs):
+                    execute(code)
+                run = (time.perf_counter() - start) / args.runs
+                print(f'{name:22} {label}: {1e3 * run:6.2f} ms/run '
+                      f'{1 / run:7.1f} runs/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark of moodle.participants.read vs the original whole-page regex.
+
+Generates synthetic "Pessoas" pages (as saved by the browser) and reports the
+time and peak memory of each parser:
+    - a regular page, with USERS participants;
+    - a page with BAD_USERS participants without editable role links, where
+      the original regex backtracks through the rest of the page.
+
+    python benchmarks/participants.py [-n USERS] [-b BAD_USERS]
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import moodle.participants  # noqa: E402
+
+
+PADDING = ('<div class="c-col" style="display:none"><span class="badge">info'
+           '</span><a href="https://x/user/view.php?id=1&amp;course=2" '
+           'class="aabtn">detalhe</a></div>\n') * 25
+
+
+def regex_read(file, group='', role='Estudante'):
+    """The original moodle.participants.read (whole page, single regex)."""
+    with open(file) as htmlfile:
+        html = htmlfile.read()
+
+    pattern = re.compile(r'<label for=.*?user\d+.*?<img.*?>(.*?)</a>.*?'
+                         r'>([\d\w]*?)@(aluno\.)?.*?\..*?<[.\s\S]*?'
+                         r'"Atribuições de papéis.*?>[\s\S] *(\w.*)[\s\S]'
+                         r'[.\s\S]*?'
+                         r'"Editar grupos.*?>[\s\S] *(\w.*)[\s\S]')
+    return {s_id: {'Name': name, 'Role': s_role, 'Group': s_group}
+            for name, s_id, is_aluno, s_role, s_group in pattern.findall(html)
+            if group in s_group and role in s_role}
+
+
+def write_page(file, users, editable=True):
+    """Writes a participants page, with (or without) editable role links."""
+    role_title = 'Atribuições de papéis' if editable else 'Papéis'
+    rows = []
+    for i in range(users):
+        rows.append(
+            f'<tr><td><input type="checkbox" id="user{5000 + i}">'
+            f'<label for="user{5000 + i}" class="accesshide">Selecionar '
+            f'\'Nome{i}\'</label></td><th><a href="https://x/?id={i}">'
+            f'<img src="p.png" class="userpicture" alt="">Nome{i} Sobre{i}'
+            f'</a></th><td>{190000000 + i}@aluno.unb.br</td>\n{PADDING}'
+            f'<td><span><a href="#" title="{role_title} de Nome{i}">\n'
+            f' Estudante\n</a></span></td>\n{PADDING}'
+            f'<td><span><a href="#" title="Editar grupos de Nome{i}">\n'
+            f' Turma {chr(65 + i % 5)}\n</a></span></td></tr>')
+    with open(file, 'w') as f:
+        f.write('<html><body><table>\n' + '\n'.join(rows) +
+                '</table></body></html>')
+
+
+def main():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('-n', '--users', type=int, default=3000)
+    parser.add_argument('-b', '--bad_users', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for users, editable in ((args.users, True),
+                                (args.bad_users, False)):
+            file = os.path.join(tmp_dir, 'participants.html')
+            write_page(file, users, editable)
+            print(f'{users} users{"" if editable else " (no role links)"}, '
+                  f'{os.path.getsize(file) / 2**20:.1f} MB:')
+            for name, reader in (('regex', regex_read),
+                                 ('chunked', moodle.participants.read)):
+                start = time.perf_counter()
+                result = reader(file)
+                elapsed = time.perf_counter() - start
+                tracemalloc.start()
+                reader(file)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                print(f'  {name}: {elapsed:.2f}s, {peak / 2**20:.1f} MB peak, '
+                      f'{len(result)} participants')
+
+
+if __name__ == '__main__':
+    main()
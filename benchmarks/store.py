@@ -0,0 +1,69 @@
+"""Benchmark of moodle.quiz.grades.read (dicts) vs load (moodle.store).
+
+Generates a synthetic quiz grades report (as exported by Moodle) and reports
+the best time of each reader and the memory retained by its result.
+
+    python benchmarks/store.py [-n STUDENTS] [-q QUESTIONS] [-r REPEAT]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import moodle.quiz.grades  # noqa: E402
+
+
+def write_report(file, students, questions):
+    """Writes a quiz grades report with random grades (and some '-')."""
+    random.seed(1)
+    with open(file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Sobrenome', 'Nome', 'Email', 'Estado', 'Iniciado',
+                         'Completo', 'Tempo', 'Avaliar/10,00'] +
+                        [f'Q. {q} /2,00' for q in range(1, questions + 1)])
+        for i in range(students):
+            writer.writerow([f'Sobre{i}', f'Nome{i}',
+                             f'{190000000 + i}@aluno.unb.br', 'Finalizada',
+                             '', '', '', '5'] +
+                            [random.choice(('-', '2,00', '1,50', '0,00'))
+                             for _ in range(questions)])
+
+
+def main():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('-n', '--students', type=int, default=1500)
+    parser.add_argument('-q', '--questions', type=int, default=200)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file = os.path.join(tmp_dir, 'quiz.grades.csv')
+        write_report(file, args.students, args.questions)
+        print(f'{args.students} students x {args.questions} questions '
+              f'({os.path.getsize(file) / 2**20:.1f} MB)')
+        for name, reader in (('read', moodle.quiz.grades.read),
+                             ('load', moodle.quiz.grades.load)):
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                reader(file, 'L1')
+                best = min(best, time.perf_counter() - start)
+
+            tracemalloc.start()
+            result = reader(file, 'L1')
+            retained, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del result
+            print(f'{name}: {best:.3f}s, {retained / 2**20:.1f} MB retained')
+
+
+if __name__ == '__main__':
+    main()
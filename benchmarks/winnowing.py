@@ -0,0 +1,91 @@
+"""Benchmark of winnowing.compare as the number of submissions grows.
+
+For each n, generates n synthetic answers to the same question (random
+statements from a common pool, with some groups of copies) and reports the
+time of each step of compare (fingerprints, index, candidate pairs and
+similarity), the number of candidate pairs out of all n * (n - 1) / 2 pairs,
+and the time of comparing every pair instead (up to --all_pairs files).
+
+    python benchmarks/winnowing.py [-n N [N ...]] [-a ALL_PAIRS]
+"""
+
+from itertools import combinations
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import winnowing  # noqa: E402
+
+STATEMENTS = ('x = {a} + y * {b}', 'if x > {a}:\n    y -= {b}',
+              'for i in range({a}):\n    x += i % {b}',
+              'while x < {a}:\n    x = x * {b} + 1',
+              'print(x, y, "{a}")', 'y = [k for k in range({a}) if k > x]',
+              'def f{a}(v):\n    return v * {b}', 'x = abs(y - {a})',
+              'try:\n    y = x // {b}\nexcept ZeroDivisionError:\n    y = 0')
+
+
+def sources(n, copies=3, seed=1):
+    """Returns the dict {file: code} with n answers, where one in every 20
+    is the first of a group of copies (of up to copies files).
+    """
+    rng = random.Random(seed)
+    found = {}
+    while len(found) < n:
+        code = 'x, y = int(input()), 1\n' + '\n'.join(
+            rng.choice(STATEMENTS).format(a=rng.randint(1, 99),
+                                          b=rng.randint(1, 9))
+            for _ in range(rng.randint(15, 30))) + '\n'
+        group = copies if len(found) % 20 == 0 else 1
+        for _ in range(min(group, n - len(found))):
+            found[f'{len(found):05}.py'] = code
+    return found
+
+
+def main():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('-n', '--files', type=int, nargs='+',
+                        default=[100, 200, 400, 800, 1600, 3200])
+    parser.add_argument('-a', '--all_pairs', type=int, default=1600,
+                        help='Largest n whose pairs are all compared.')
+    args = parser.parse_args()
+
+    print(f'{"n":>6} {"prints":>8} {"index":>8} {"pairs":>8} '
+          f'{"compare":>8} {"all pairs":>9} {"candidates/total":>20} '
+          f'{"pruned":>7}')
+    for n in args.files:
+        files = sources(n)
+        start = time.perf_counter()
+        prints = {file: winnowing.fingerprints(winnowing.tokens(code))
+                  for file, code in files.items()}
+        times = [time.perf_counter()]
+        postings = winnowing.index(prints)
+        times.append(time.perf_counter())
+        shared = winnowing.candidates(postings)
+        times.append(time.perf_counter())
+        winnowing.compare(files)
+        times.append(time.perf_counter())
+        compare = times[-1] - times[-2]
+        steps = [times[0] - start, times[1] - times[0], times[2] - times[1]]
+
+        all_pairs = '-'
+        if n <= args.all_pairs:
+            keys = {file: fp.keys() for file, fp in prints.items()}
+            start = time.perf_counter()
+            for file1, file2 in combinations(keys, 2):
+                len(keys[file1] & keys[file2])
+            all_pairs = f'{time.perf_counter() - start:.3f}s'
+
+        total = n * (n - 1) // 2
+        print(f'{n:>6} ' + ' '.join(f'{t:>7.3f}s' for t in steps) +
+              f' {compare:>7.3f}s {all_pairs:>9} '
+              f'{f"{len(shared)}/{total}":>20} '
+              f'{100 * (1 - len(shared) / max(total, 1)):>6.1f}%')
+
+
+if __name__ == '__main__':
+    main()
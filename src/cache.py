@@ -0,0 +1,160 @@
+"""Cache em disco dos relatórios processados.
+
+Armazena o dicionário retornado pelo método "read" de cada relatório, evitando
+processar novamente arquivos que não foram modificados desde a última
+execução. A chave de cada entrada combina tamanho, data de modificação e
+conteúdo (hash) do arquivo com o nome, a versão (hash do código-fonte do
+módulo, veja version) e os argumentos do método de leitura, além de
+CACHE_VERSION, que deve ser incrementada quando uma alteração fora do módulo
+do método de leitura mudar o resultado da leitura.
+"""
+
+from functools import lru_cache
+import hashlib
+import os
+import pickle
+import sys
+
+
+DEFAULT_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME',
+                                          os.path.join(os.path.expanduser('~'),
+                                                       '.cache')),
+                           'cic-tools')
+DEFAULT_MAX_SIZE = 256  # MB
+EXT = '.pickle'
+CACHE_VERSION = 1
+
+
+@lru_cache
+def _module_digest(module):
+    """Retorna o hash (string) do código-fonte do módulo, ou None se não
+    for possível lê-lo.
+    """
+    try:
+        with open(sys.modules[module].__file__, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (KeyError, AttributeError, TypeError, OSError):
+        return None
+
+
+def version(reader):
+    """Retorna a versão do método de leitura: o hash do código-fonte do seu
+    módulo, de modo que alterações no módulo invalidem as entradas do cache.
+
+    Argumentos:
+    reader -- o método de leitura.
+    """
+    return _module_digest(reader.__module__)
+
+
+def key(file, reader, *args):
+    """Retorna a chave (string) que identifica a leitura de um arquivo.
+
+    Argumentos:
+    file -- caminho para o arquivo a ser lido.
+    reader -- nome do método de leitura.
+    args -- argumentos adicionais do método de leitura.
+    """
+    stat = os.stat(file)
+    digest = hashlib.sha256(repr((CACHE_VERSION, reader, args, stat.st_size,
+                                  stat.st_mtime_ns)).encode())
+    with open(file, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get(key, cache_dir=DEFAULT_DIR):
+    """Retorna a tupla (encontrado, valor) armazenada para a chave.
+
+    Argumentos:
+    key -- chave da entrada (veja a função key).
+    cache_dir -- diretório do cache.
+                 (default DEFAULT_DIR)
+    """
+    file = os.path.join(cache_dir, f'{key}{EXT}')
+    try:
+        with open(file, 'rb') as f:
+            value = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return False, None
+
+    try:
+        os.utime(file)  # Registra o uso para o descarte (veja evict).
+    except OSError:  # Descartado por outro processo.
+        pass
+    return True, value
+
+
+def put(key, value, cache_dir=DEFAULT_DIR):
+    """Armazena o valor para a chave.
+
+    A gravação é atômica, podendo ser feita por processos concorrentes, e o
+    arquivo temporário é removido se houver falha.
+
+    Argumentos:
+    key -- chave da entrada (veja a função key).
+    value -- objeto a ser armazenado.
+    cache_dir -- diretório do cache.
+                 (default DEFAULT_DIR)
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    file = os.path.join(cache_dir, f'{key}{EXT}')
+    tmp_file = f'{file}.{os.getpid()}'
+    try:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
+
+def evict(cache_dir=DEFAULT_DIR, max_size=DEFAULT_MAX_SIZE):
+    """Remove as entradas usadas há mais tempo até que o tamanho total do
+    cache não ultrapasse o limite.
+
+    Retorna a quantidade de entradas removidas.
+
+    Argumentos:
+    cache_dir -- diretório do cache.
+                 (default DEFAULT_DIR)
+    max_size -- tamanho máximo do cache, em MB.
+                (default DEFAULT_MAX_SIZE)
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(EXT):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total, removed = sum(size for _, size, _ in entries), 0
+    for _, size, path in sorted(entries):
+        if total <= max_size * 2**20:
+            break
+        os.remove(path)
+        total, removed = total - size, removed + 1
+    return removed
+
+
+def main():
+    """Processa argumentos da linha de comando."""
+
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('-d', '--cache_dir', default=DEFAULT_DIR,
+                        help='Diretório do cache.')
+    parser.add_argument('-s', '--max_size', type=int, default=DEFAULT_MAX_SIZE,
+                        help='Tamanho máximo do cache (em MB).')
+
+    args = parser.parse_args()
+    print(f'{evict(args.cache_dir, args.max_size)} entradas removidas.')
+
+
+if __name__ == '__main__':
+    main()
@@ -97,8 +97,8 @@ def _change_setting(category, question, setting, value, sep=' > '):
     if setting in CANT_CHANGE:
         return f'Unable to change "{setting}"!'
 
-    if f'_change_{setting}' in globals():
-        exec(f'_change_{setting}(question, value)')
+    if change := CHANGERS.get(setting):
+        change(question, value)
     else:
         _change_default(question, setting, value)
 
@@ -111,9 +111,10 @@ def _check_default(question, setting, values=[]):
 
     If values are given, setting cannot be empty.
     """
-    element = question.find(f'{setting}/text')
-    if element is None:
-        element = question.find(f'{setting}')
+    # Single-tag lookups (no path parsing), as this runs for every setting.
+    element = question.find(setting)
+    if element is not None and (child := element.find('text')) is not None:
+        element = child
     if element is not None and (text := element.text):
         if values and text not in values and values[0]:
             return f'value is "{text}" (should be "{values[0]}")'
@@ -160,8 +161,8 @@ def _check_questiontext(question, values):
 
 
 def _check_setting(question, setting, values):
-    if f'_check_{setting}' in globals():
-        if issues := eval(f'_check_{setting}(question, values)'):
+    if check := CHECKERS.get(setting):
+        if issues := check(question, values):
             return f'[{setting}] {issues}'
     elif issues := _check_default(question, setting, values):
         return f'[{setting}] {issues}'
@@ -231,22 +232,77 @@ def _clean_html(html):
     def remove_span_tag(matchobj):
         return matchobj.group(0)[6:-7]  # chars between <span> and </span>
 
-    replacements = ((r'( style="font-size: \d+\.\d+rem;"?)', ''),
-                    (r'( style="")', ''),
-                    (r'(<span>[.\s\S]*?</span>)', remove_span_tag),
-                    (r'&nbsp;', ' '),
-                    (r'<([^ ]*?)><br></(\1)>', ''),
-                    (r'<([^ ]*?)></(\1)>', ''),
-                    # Remove nested <span>.
-                    (r'(<span>[.\s\S]*?</span>)', remove_span_tag),
-                    (r'(<span>[.\s\S]*?</span>)', remove_span_tag))
-
-    for pattern, replace in replacements:
-        html = re.sub(pattern, replace, html)
+    def replace_style_or_nbsp(matchobj):
+        return ' ' if matchobj.group(0) == '&nbsp;' else ''
+
+    # Each pass only runs if its pattern may match.
+    if 'style="' in html or '&nbsp;' in html:
+        html = HTML_PATTERNS['style_or_nbsp'].sub(replace_style_or_nbsp, html)
+    if '<span>' in html:
+        html = HTML_PATTERNS['span'].sub(remove_span_tag, html)
+    if '><br></' in html:
+        html = HTML_PATTERNS['empty_br'].sub('', html)
+    if '></' in html:
+        html = HTML_PATTERNS['empty'].sub('', html)
+    for _ in range(2):  # Remove nested <span>.
+        if '<span>' not in html:
+            break
+        html = HTML_PATTERNS['span'].sub(remove_span_tag, html)
 
     return html
 
 
+# Setting dispatch: _check_SETTING/_change_SETTING methods, if available.
+CHECKERS = {'displayfeedback': _check_displayfeedback,
+            'precheck': _check_precheck,
+            'questiontext': _check_questiontext,
+            'tags': _check_tags,
+            'template': _check_template,
+            'testcases': _check_testcases}
+CHANGERS = {'questiontext': _change_questiontext}
+HTML_PATTERNS = {  # See _clean_html.
+    'style_or_nbsp': re.compile(r' style="(?:font-size: \d+\.\d+rem;"?|")|'
+                                r'&nbsp;'),
+    'span': re.compile(r'<span>[\s\S]*?</span>'),
+    'empty_br': re.compile(r'<([^ ]*?)><br></(\1)>'),
+    'empty': re.compile(r'<([^ ]*?)></(\1)>')}
+
+
+def _compile(setting, values):
+    """Returns the tuple (checker, fixer) for the setting, bound to its
+    expected values.
+
+    checker(question) returns the issues found (see _check_setting) and
+    fixer(question) changes the setting to the first expected value,
+    returning an issue if unable to (see _change_setting).
+    """
+    from functools import partial
+
+    value = values[0] if isinstance(values, list) and values else values
+    return (partial(_check_setting, setting=setting, values=values),
+            partial(_change_setting, None, setting=setting, value=value))
+
+
+def _category(question, category):
+    """Returns the category for the question and the following ones.
+
+    As per Moodle documentation: "Within the <quiz> tags are any number of
+    <question> tags. One of these <question> tags can be a dummy question
+    with a category type to specify a category for the import/export." Thus,
+    all questions following a "category" type belong to that category in the
+    question bank.
+    """
+    if question.get('type') == 'category':
+        return question.find('category/text').text.replace('$course$/top/', '')
+    return category
+
+
+def _is_coderunner(question):
+    """Returns whether the question is a (non-prototype) CodeRunner one."""
+    return (question.get('type') == 'coderunner' and
+            question.find('prototypetype').text == '0')
+
+
 def _coderunner_questions(file):
     """Iterates through the questions in the given XML file.
 
@@ -256,19 +312,69 @@ def _coderunner_questions(file):
 
     tree, category = ET.parse(file), None
     for question in tree.getroot():
-        # As per Moodle documentation: "Within the <quiz> tags are any
-        # number of <question> tags. One of these <question> tags can be a
-        # dummy question with a category type to specify a category for the
-        # import/export." Thus, all questions following a "category" type
-        # belong to that category in the question bank.
-        if question.get('type') == 'category':
-            category = question.find('category/text').text.replace(
-                '$course$/top/', '')
-        elif (question.get('type') == 'coderunner' and
-              question.find('prototypetype').text == '0'):
+        category = _category(question, category)
+        if _is_coderunner(question):
             yield tree, category, question
 
 
+def _stream_coderunner_questions(file, outfile=None):
+    """Iterates through the questions in the given XML file, parsing (and
+    writing) one question at a time.
+
+    Each item is the tuple (None, category, question), as in
+    _coderunner_questions, but only the current question is kept in memory.
+    After each item is processed, the question is written to outfile (if
+    given) and discarded, so any changes must be made before requesting the
+    next item.
+    """
+    from xml.sax.saxutils import quoteattr
+
+    def flush(element):
+        # Writes the previous question, whose tail is only complete when the
+        # next one starts (or the quiz ends), and discards it.
+        nonlocal started
+        if out and not started:
+            attributes = ''.join(f' {key}={quoteattr(value)}'
+                                 for key, value in root.items())
+            out.write(f'<{root.tag}{attributes}>'
+                      f'{ET._escape_cdata(root.text or "")}')
+            started = True
+        if element is not None:
+            if out:
+                out.write(ET.tostring(element, encoding='unicode'))
+            root.remove(element)
+
+    out = None if outfile is None else open(outfile, 'w', encoding='UTF-8')
+    try:
+        if out:
+            out.write("<?xml version='1.0' encoding='UTF-8'?>\n")
+
+        root, category, depth, previous, started = None, None, 0, None, False
+        for event, element in ET.iterparse(file, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = element
+                elif depth == 2:
+                    flush(previous)
+                    previous = None
+                continue
+
+            depth -= 1
+            if depth == 1:
+                category = _category(element, category)
+                if _is_coderunner(element):
+                    yield None, category, element
+                previous = element
+
+        flush(previous)
+        if out:
+            out.write(f'</{root.tag}>')
+    finally:
+        if out:
+            out.close()
+
+
 def _print_dict(d, indent_level=0):
     for k, v in d.items():
         if isinstance(v, dict):
@@ -279,7 +385,8 @@ def _print_dict(d, indent_level=0):
 
 
 def check(file, values, outfile=None, set_values=False,
-          yes_to_all=False, ignore_list=[], sep=' > '):
+          yes_to_all=False, ignore_list=[], sep=' > ', stream=False,
+          counts=None):
     """Checks all questions in quiz file with the given setting values.
 
     Returns a boolean indicating if no issue was found. Also prints any
@@ -300,10 +407,16 @@ def check(file, values, outfile=None, set_values=False,
                     (default: [])
       - sep: string for separating question category levels.
              (default: ' > ')
+      - stream: boolean indicating whether to parse (and write) one
+                question at a time, keeping memory usage flat regardless of
+                the file size (see _stream_coderunner_questions).
+                (default: False)
+      - counts: dict to be updated with the number of issues found per
+                setting, in the {setting: count} format.
+                (default: None)
     """
-    def fix_issue(category, question, setting, value, sep):
-        if issue := _change_setting(category, question, setting,
-                                    value, sep):
+    def fix_issue(question, setting, fixer):
+        if issue := fixer(question):
             print(f'\t[{setting}] {issue}')
         else:
             print(f'\t[{setting}] changed!')
@@ -321,65 +434,173 @@ def check(file, values, outfile=None, set_values=False,
         now = datetime.now().strftime('%Y%m%d%H%M%S')
         outfile = f'{file[:-4]}_{now}{file[-4:]}'
 
-    all_valid = True
-    for tree, category, question in _coderunner_questions(file):
+    if stream:
+        questions = _stream_coderunner_questions(
+            file, outfile if set_values else None)
+    else:
+        questions = _coderunner_questions(file)
+
+    all_valid, tree, plan = True, None, {}  # plan: {setting: (check, fix)}
+    for tree, category, question in questions:
         name = question.find('name/text').text
 
         if not question.find('tags'):
             question.append(ET.Element('tags'))
 
         for child in question:
-            setting, value = child.tag, values.get(child.tag, [])
-            if setting in ignore_list:
+            if (setting := child.tag) in ignore_list:
                 continue
 
-            if issues := _check_setting(question, setting, value):
+            if (step := plan.get(setting)) is None:
+                step = plan[setting] = _compile(setting,
+                                                values.get(setting, []))
+            checker, fixer = step
+            if issues := checker(question):
                 all_valid, category = False, parse_category(category)
                 print(f'{category}{sep}{name}: {issues}.')
+                if counts is not None:
+                    counts[setting] = counts.get(setting, 0) + 1
 
                 if not set_values:
                     continue
 
                 if yes_to_all or user_fix(setting):
-                    if isinstance(value, list) and value:
-                        value = value[0]
-                    fix_issue(category, question, setting, value, sep)
+                    fix_issue(question, setting, fixer)
                 print()
 
         if set_values:
             _add_CDATA(question)
 
-    if set_values:
+    if set_values and not stream:
+        if tree is None:  # No CodeRunner questions.
+            tree = ET.parse(file)
         tree.write(outfile, encoding='UTF-8', xml_declaration=True)
 
     return all_valid
 
 
+def _check_file(args):
+    """Checks a single file, capturing its output (see check).
+
+    Returns the tuple (file, all_valid, output, counts), where counts is a
+    dict with the number of issues per setting. Used by the process pool in
+    main, so the output of each file can be printed in order.
+    """
+    import contextlib
+    import io
+
+    file, counts, output = args[0], {}, io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            all_valid = check(*args, counts=counts)
+        except Exception as e:  # Reported, without stopping other files.
+            print(f'Unable to check file: {e!r}')
+            all_valid = False
+    return file, all_valid, output.getvalue(), counts
+
+
+def _xml_files(paths):
+    """Returns the list of XML files given, replacing each directory by the
+    (sorted) XML files in it.
+    """
+    import os
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, file)
+                         for file in sorted(os.listdir(path))
+                         if file.endswith('.xml'))
+        else:
+            files.append(path)
+    return files
+
+
 def main():
-    """Process command line arguments."""
+    """Process command line arguments.
+
+    Multiple files (or directories with XML files) are checked in a process
+    pool, unless values must be set interactively (without -y). The results
+    are printed in the given file order, followed by a summary.
+    """
 
     from argparse import ArgumentParser
+    import os
 
     parser = ArgumentParser()
-    parser.add_argument('file', help='Quiz XML file.')
+    parser.add_argument('files', nargs='+',
+                        help='Quiz XML files (or directories with them).')
     parser.add_argument('-l', '--list_values', action='store_true',
                         help='List suggested values and exit.')
     parser.add_argument('-s', '--set_values', action='store_true',
                         help='Set values, writing to a new file.')
     parser.add_argument('-o', '--outfile',
-                        help='Output file name.')
+                        help='Output file name (or directory, for multiple '
+                             'files).')
     parser.add_argument('-y', '--yes_to_all', action='store_true',
                         help='Answer YES to any interactions.')
     parser.add_argument('-i', '--ignore', nargs='*', default=[],
                         help='Ignore given settings.')
+    parser.add_argument('--stream', action='store_true',
+                        help='Process one question at a time (for large '
+                             'files).')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of processes for checking files.')
     args = parser.parse_args()
 
     if args.list_values:
         print('Suggested values:')
         _print_dict(DEFAULTS)
+        return
+
+    files = _xml_files(args.files)
+    if len(files) == 1 or args.outfile is None:
+        outfiles = [args.outfile] * len(files)
+    else:
+        os.makedirs(args.outfile, exist_ok=True)
+        outfiles = [os.path.join(args.outfile, os.path.basename(file))
+                    for file in files]
+
+    def interactive(tasks):
+        for task in tasks:
+            if len(files) > 1:
+                print(f'{task[0]}:')
+            counts = {}
+            yield task[0], check(*task, counts=counts), None, counts
+
+    def report(results):
+        per_file, per_setting = {}, {}
+        for file, all_valid, output, counts in results:
+            if output is not None:  # Not yet printed.
+                if len(files) > 1:
+                    print(f'{file}:')
+                print(output, end='')
+
+            if all_valid or counts:
+                per_file[file] = sum(counts.values())
+            else:  # Unable to check the file.
+                per_file[file] = 'error'
+            for setting, count in counts.items():
+                per_setting[setting] = per_setting.get(setting, 0) + count
+
+        if len(files) > 1:
+            print('\nIssues per file:')
+            _print_dict(per_file)
+            print('Issues per setting:')
+            _print_dict(dict(sorted(per_setting.items())))
+
+    tasks = [(file, DEFAULTS, outfile, args.set_values, args.yes_to_all,
+              args.ignore, ' > ', args.stream)
+             for file, outfile in zip(files, outfiles)]
+    if args.set_values and not args.yes_to_all:
+        report(interactive(tasks))
+    elif args.jobs > 1 and len(tasks) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(args.jobs) as executor:
+            report(executor.map(_check_file, tasks))
     else:
-        check(args.file, DEFAULTS, args.outfile, set_values=args.set_values,
-              yes_to_all=args.yes_to_all, ignore_list=args.ignore)
+        report(map(_check_file, tasks))
 
 
 if __name__ == '__main__':
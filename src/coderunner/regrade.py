@@ -0,0 +1,252 @@
+"""Bulk regrading of quiz responses against CodeRunner test cases.
+
+Runs every submission of a question, as written by
+moodle.quiz.responses.write (a Q{n} directory or zip file, with one
+{s_id}.{ext} file per student), against the test cases of the question in a
+CodeRunner XML export (see runner.run). Submissions run in a process pool,
+and identical answers are run only once.
+
+The grades are returned in the same format as moodle.quiz.grades.read.
+"""
+
+import os
+import xml.etree.ElementTree as ET
+
+import checklist
+import runner
+
+
+_state = {}  # Question, prototypes, worker and cache of each pool process.
+
+
+def _init(question, prototypes, cpu_limit, warm, cache_file):
+    """Initializes a pool process, parsing the question once and starting
+    its warm worker (see runner.Worker) and cache (see runner.Cache), if
+    requested.
+    """
+    _state.update(question=ET.fromstring(question), prototypes=prototypes,
+                  cpu_limit=cpu_limit,
+                  worker=runner.Worker() if warm else None,
+                  cache=cache_file and runner.Cache(cache_file))
+
+
+def _grade(answer):
+    """Returns the tuple (grade, hits, runs), where grade is None if unable
+    to run the answer, and hits and runs are the number of cached and total
+    runs (see runner.Cache).
+    """
+    cache = _state['cache']
+    before = cache and (cache.hits, cache.misses)
+    try:
+        grade, _ = runner.run(_state['question'], answer,
+                              _state['prototypes'], _state['cpu_limit'],
+                              _state['worker'], cache)
+    except ValueError:
+        grade = None
+    if cache is None:
+        return grade, 0, 0
+    hits = cache.hits - before[0]
+    return grade, hits, hits + cache.misses - before[1]
+
+
+def _split_header(content, s_id, ext):
+    """Returns the tuple (name, answer) of a submission file, removing the
+    exact header written by moodle.quiz.responses.write: the student's name,
+    s_id and extra information, as '# ' lines (py), a '/* ... */' comment
+    (c and cpp) or a single line (other extensions), followed by a blank
+    line.
+    """
+    if ext in ('c', 'cpp'):
+        header, _, answer = content.partition(' */\n\n')
+        return header.split('\n')[0][len('/* '):], answer
+
+    header, _, answer = content.partition('\n\n')
+    if ext == 'py':
+        return header.split('\n')[0][len('# '):], answer
+    name, _, _ = header.partition(f' {s_id}')
+    return name, answer
+
+
+def submissions(path, ext='py'):
+    """Returns a dict {s_id: (name, answer)} with the submissions in the
+    question's directory (or zip file), as written by
+    moodle.quiz.responses.write.
+
+    Only files with the given extension are read. The header of each file
+    (see _split_header) is removed from the answer. The correct answer
+    (CORRECT.{ext}) is not included.
+    """
+    def is_submission(file):
+        s_id, dot, file_ext = file.rpartition('.')
+        return dot and file_ext == ext and s_id != 'CORRECT'
+
+    if os.path.isdir(path):
+        contents = {}
+        for file in filter(is_submission, os.listdir(path)):
+            with open(os.path.join(path, file)) as f:
+                contents[file] = f.read()
+    else:
+        import zipfile
+
+        with zipfile.ZipFile(path) as zip_file:
+            contents = {name: zip_file.read(name).decode()
+                        for name in filter(is_submission,
+                                           zip_file.namelist())}
+
+    found = {}
+    for file, content in contents.items():
+        s_id = file.rpartition('.')[0]
+        found[s_id] = _split_header(content, s_id, ext)
+    return found
+
+
+def regrade(question, path, quiz=None, q=None, ext='py', prototypes={},
+            jobs=None, cpu_limit=None, warm=True,
+            cache_file=runner.CACHE_FILE, counts=None):
+    """Runs all submissions of a question against its test cases.
+
+    Returns a dict in the {s_id: {'Name': name, quiz: {q: grade}}} format
+    (as moodle.quiz.grades.read), with grades between 0 and 1, or None for
+    a submission that could not be run.
+
+    The question is checked once (see runner.check) before running the
+    submissions, raising ValueError if it cannot be run (e.g. missing
+    prototype or unsupported template).
+
+    Args:
+      - question: Element with the CodeRunner question.
+      - path: question's directory (or zip file) with the submissions
+              (see submissions).
+      - quiz: string with the quiz name.
+              (default: None, for the parent directory's name)
+      - q: string with the question index.
+           (default: None, from the path's name, as in Q{q})
+      - ext: string with the submission files extension.
+             (default: 'py')
+      - prototypes: dict with the available prototypes (see
+                    runner.prototypes).
+                    (default: {})
+      - jobs: number of processes running the submissions.
+              (default: None, for the number of CPUs)
+      - cpu_limit: CPU time limit (in seconds) for each run.
+                   (default: None, for the question's limit)
+      - warm: boolean indicating whether each process runs the submissions
+              in a warm worker (see runner.Worker), instead of starting a
+              new interpreter per run.
+              (default: True)
+      - cache_file: SQLite file with the results of previous runs (see
+                    runner.Cache), or None for running every time.
+                    (default: runner.CACHE_FILE)
+      - counts: dict to be updated with the number of runs, in the
+                {'hits': cached runs, 'runs': total runs} format.
+                (default: None)
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    base = os.path.basename(os.path.normpath(path))
+    base = base[:-4] if base.endswith('.zip') else base
+    if quiz is None:
+        quiz = os.path.basename(os.path.dirname(os.path.normpath(path)))
+    if q is None:
+        q = base[1:] if base.startswith('Q') else base
+
+    runner.check(question, prototypes)
+    found = submissions(path, ext)
+    answers = sorted({answer for _, answer in found.values()})
+    jobs = jobs or os.cpu_count()
+    initargs = (ET.tostring(question), prototypes, cpu_limit, warm,
+                cache_file)
+    with ProcessPoolExecutor(jobs, initializer=_init,
+                             initargs=initargs) as executor:
+        chunksize = max(1, len(answers) // (4 * jobs))
+        grades = {}
+        for answer, (grade, hits, runs) in zip(answers, executor.map(
+                _grade, answers, chunksize=chunksize)):
+            grades[answer] = grade
+            if counts is not None:
+                counts['hits'] = counts.get('hits', 0) + hits
+                counts['runs'] = counts.get('runs', 0) + runs
+    if cache_file is not None:
+        runner.Cache(cache_file).close()  # LRU eviction (see runner.Cache).
+
+    return {s_id: {'Name': name, quiz: {q: grades[answer]}}
+            for s_id, (name, answer) in sorted(found.items())}
+
+
+def main():
+    """Process command line arguments."""
+
+    from argparse import ArgumentParser
+    import time
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('file', help='Quiz XML file with the question.')
+    parser.add_argument('path',
+                        help='Question directory (or zip file) with the '
+                             'submissions (see moodle.quiz.responses.write).')
+    parser.add_argument('-n', '--name',
+                        help='Question name (required if the file has more '
+                             'than one question).')
+    parser.add_argument('-q', '--quiz',
+                        help='Quiz name (default: parent directory name).')
+    parser.add_argument('-e', '--ext', default='py',
+                        help='Submission files extension.')
+    parser.add_argument('-p', '--prototypes', nargs='*', default=[],
+                        help='XML files with the prototypes used.')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='Number of processes (default: number of '
+                             'CPUs).')
+    parser.add_argument('-t', '--timeout', type=int,
+                        help='CPU time limit (in seconds) for each run.')
+    parser.add_argument('--cold', action='store_true',
+                        help='Start a new interpreter per run, instead of '
+                             'forking from a warm worker.')
+    parser.add_argument('--no_cache', dest='cache', action='store_false',
+                        help='Do not use the cache of results.')
+    parser.add_argument('--cache_file', default=runner.CACHE_FILE,
+                        help='SQLite file with the cache of results.')
+    args = parser.parse_args()
+
+    available = {}
+    for file in [os.path.join(os.path.dirname(__file__),
+                              'python3_try_except.xml')] + args.prototypes:
+        available.update(runner.prototypes(file))
+    available.update(runner.prototypes(args.file))
+
+    questions = [question for question in ET.parse(args.file).getroot()
+                 if checklist._is_coderunner(question) and
+                 args.name in (None, question.findtext('name/text'))]
+    if len(questions) != 1:
+        parser.error(f'{len(questions)} questions found (use -n to select '
+                     'one by name).')
+
+    start, counts = time.perf_counter(), {}
+    try:
+        grades = regrade(questions[0], args.path, args.quiz, ext=args.ext,
+                         prototypes=available, jobs=args.jobs,
+                         cpu_limit=args.timeout, warm=not args.cold,
+                         cache_file=args.cache_file if args.cache else None,
+                         counts=counts)
+    except ValueError as e:
+        parser.exit(1, f'{questions[0].findtext("name/text")}: {e}.\n')
+    elapsed = time.perf_counter() - start
+
+    errors = 0
+    for info in grades.values():
+        quiz = next(key for key in info if key != 'Name')
+        errors += None in info[quiz].values()
+        grades_list = ', '.join('error' if g is None else f'{g:.2f}'
+                                for g in info[quiz].values())
+        print(f'{info["Name"]}: {quiz} ({grades_list})')
+    print(f'{len(grades)} submissions graded in {elapsed:.2f}s '
+          f'({60 * len(grades) / max(elapsed, 1e-9):.0f} submissions/min)')
+    if errors:
+        print(f'{errors} submissions could not be run.')
+    if args.cache:
+        hits, runs = counts.get('hits', 0), counts.get('runs', 0)
+        print(f'Cache hits: {hits}/{runs} runs '
+              f'({100 * hits / max(runs, 1):.0f}%)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1003 @@
+"""Local execution of CodeRunner questions.
+
+Runs an answer (by default, the question's own answer) against the test
+cases of a question exported in Moodle XML format, as CodeRunner would:
+the question's (or its prototype's) template is rendered with the Twig
+subset described in render, executed in a subprocess with CPU, memory and
+file size limits, and each test case output is graded (see GRADERS).
+
+Details in: https://github.com/trampgeek/moodle-qtype_coderunner
+"""
+
+import functools
+import html
+import json
+import os
+import re
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+
+import checklist
+
+
+CPU_LIMIT = 3  # seconds
+MEM_LIMIT = 1000  # MB
+FILE_LIMIT = 20  # MB, for files written, including the output.
+WARM_MEM_LIMIT = 64  # MB, minimum memory limit for warm workers (see Worker).
+WARM = hasattr(os, 'fork') and hasattr(os, 'pidfd_open')  # Linux only.
+SPLITTER = r'|#<ab@17943918#@>#\n|ms'  # CodeRunner's default.
+RUN_ERROR = '\n***Run error***\n'
+TIMEOUT_ERROR = '***Time limit exceeded***\n'
+WORKER_ERROR = 'Worker killed while running the program\n'
+CACHE_FILE = os.path.join(os.environ.get('XDG_CACHE_HOME',
+                                         os.path.join(os.path.expanduser('~'),
+                                                      '.cache')),
+                          'cic-tools', 'coderunner.sqlite')
+CACHE_MAX_SIZE = 256  # MB
+CACHE_VERSION = 2  # Of the stored results, changed when they change.
+
+LANGUAGES = {  # language: (source file, command)
+    'python3': ('prog.py', [sys.executable, '-I', 'prog.py'])}
+PROTOTYPE_SETTINGS = ['template', 'iscombinatortemplate',
+                      'allowmultiplestdins', 'testsplitterre', 'grader',
+                      'language', 'cputimelimitsecs', 'memlimitmb',
+                      'templateparams', 'allornothing']
+BUILTIN_PROTOTYPES = {  # Approximation of CodeRunner's built-in types.
+    'python3': {'template': '{{ STUDENT_ANSWER }}\n\n'
+                            'SEPARATOR = "#<ab@17943918#@>#"\n\n'
+                            '{% for TEST in TESTCASES %}\n'
+                            '{{ TEST.testcode }}\n'
+                            '{% if not loop.last %}\n'
+                            'print(SEPARATOR)\n'
+                            '{% endif %}\n'
+                            '{% endfor %}\n',
+                'iscombinatortemplate': '1', 'grader': 'EqualityGrader',
+                'language': 'python3'}}
+
+
+#######################################################################
+# Twig subset.
+TWIG_TAGS = re.compile(r'\{([{%#])(-?)(.*?)(-?)([}%#])\}(\n?)', re.S)
+TWIG_TOKENS = re.compile(r'\s*(?:(\'(?:\\.|[^\'\\])*\'|"(?:\\.|[^"\\])*")|'
+                         r'(\d+(?:\.\d+)?)|(\w+)|'
+                         r'(==|!=|<=|>=|[<>|.,()\[\]~]))')
+
+
+def _escape_py(text):
+    return (text.replace('\\', '\\\\').replace("'", "\\'")
+            .replace('"', '\\"'))
+
+
+ESCAPERS = {'py': _escape_py, 'python': _escape_py, 'html': html.escape}
+FILTERS = {
+    'default': lambda value, default='': value if _truthy(value) else default,
+    'e': lambda value, strategy='html': ESCAPERS[strategy](_string(value)),
+    'json_encode': json.dumps,
+    'length': len,
+    'lower': lambda value: _string(value).lower(),
+    'raw': lambda value: value,
+    'trim': lambda value: _string(value).strip(),
+    'upper': lambda value: _string(value).upper()}
+FILTERS['escape'] = FILTERS['e']
+OPERATORS = {'==': lambda a, b: a == b, '!=': lambda a, b: a != b,
+             '<': lambda a, b: a < b, '>': lambda a, b: a > b,
+             '<=': lambda a, b: a <= b, '>=': lambda a, b: a >= b,
+             'in': lambda a, b: a in b}
+
+
+def _string(value):
+    """Returns the value as Twig outputs it (PHP conversion)."""
+    if value is None or value is False:
+        return ''
+    if value is True:
+        return '1'
+    return str(value)
+
+
+def _truthy(value):
+    """Returns whether the value is true for Twig (PHP conversion)."""
+    return bool(value) and value != '0'
+
+
+def _expression(text):
+    """Returns a function that evaluates the Twig expression in a context.
+
+    Supports literals, names with attribute/item access, filters (see
+    FILTERS), concatenation (~), comparisons (see OPERATORS) and the
+    boolean operators not/and/or. Unknown names evaluate to None.
+    """
+    tokens, pos = [], 0
+    while pos < len(text.rstrip()):
+        if not (m := TWIG_TOKENS.match(text, pos)):
+            raise ValueError(f'Unsupported Twig expression: "{text}"')
+        tokens.append(m.groups())
+        pos = m.end()
+    tokens.append((None, None, None, None))
+    pos = 0
+
+    def peek(*words):
+        name, symbol = tokens[pos][2:]
+        return (name or symbol) in words and (name or symbol)
+
+    def expect(*words):
+        nonlocal pos
+        if not (word := peek(*words)):
+            raise ValueError(f'Expected {words} in Twig expression: '
+                             f'"{text}"')
+        pos += 1
+        return word
+
+    def primary():
+        nonlocal pos
+        string, number, name, _ = tokens[pos]
+        pos += 1
+        if string is not None:
+            value = re.sub(r'\\(.)', r'\1', string[1:-1])
+            return lambda context: value
+        if number is not None:
+            value = float(number) if '.' in number else int(number)
+            return lambda context: value
+        if name in ('true', 'false', 'null', 'none'):
+            value = {'true': True, 'false': False}.get(name)
+            return lambda context: value
+        if name is not None:
+            return lambda context: context.get(name)
+        pos -= 1
+        expect('(')
+        inner = disjunction()
+        expect(')')
+        return inner
+
+    def arguments():
+        args = []
+        if peek('('):
+            expect('(')
+            while not peek(')'):
+                args.append(disjunction())
+                if not peek(')'):
+                    expect(',')
+            expect(')')
+        return args
+
+    def postfix():
+        nonlocal pos
+        value = primary()
+        while word := peek('.', '[', '|'):
+            pos += 1
+            if word == '.':
+                key = tokens[pos][2]
+                pos += 1
+                value = functools.partial(_attribute, value,
+                                          lambda context, key=key: key)
+            elif word == '[':
+                key = disjunction()
+                expect(']')
+                value = functools.partial(_attribute, value, key)
+            else:
+                name = tokens[pos][2]
+                pos += 1
+                if name not in FILTERS:
+                    raise ValueError(f'Unsupported Twig filter: "{name}"')
+                value = functools.partial(_filter, FILTERS[name], value,
+                                          arguments())
+        return value
+
+    def concatenation():
+        left = postfix()
+        while peek('~'):
+            expect('~')
+            right = postfix()
+            left = (lambda a, b: lambda context: _string(a(context)) +
+                    _string(b(context)))(left, right)
+        return left
+
+    def comparison():
+        left = concatenation()
+        if operator := peek(*OPERATORS):
+            expect(operator)
+            right, apply = concatenation(), OPERATORS[operator]
+            return lambda context: apply(left(context), right(context))
+        return left
+
+    def negation():
+        if peek('not'):
+            expect('not')
+            operand = negation()
+            return lambda context: not _truthy(operand(context))
+        return comparison()
+
+    def conjunction():
+        left = negation()
+        while peek('and'):
+            expect('and')
+            left = (lambda a, b: lambda context: _truthy(a(context)) and
+                    _truthy(b(context)))(left, negation())
+        return left
+
+    def disjunction():
+        left = conjunction()
+        while peek('or'):
+            expect('or')
+            left = (lambda a, b: lambda context: _truthy(a(context)) or
+                    _truthy(b(context)))(left, conjunction())
+        return left
+
+    evaluate = disjunction()
+    if pos != len(tokens) - 1:
+        raise ValueError(f'Unsupported Twig expression: "{text}"')
+    return evaluate
+
+
+def _attribute(value, key, context):
+    value, key = value(context), key(context)
+    if isinstance(value, dict):
+        return value.get(key)
+    if isinstance(value, (list, tuple)) and isinstance(key, int):
+        return value[key] if -len(value) <= key < len(value) else None
+    return None
+
+
+def _filter(function, value, args, context):
+    return function(value(context), *(arg(context) for arg in args))
+
+
+@functools.lru_cache(maxsize=64)
+def _parse(template):
+    """Returns the list of nodes of the template, where each node is a text
+    or a tuple ('print', expression), ('for', name, expression, body,
+    else_body) or ('if', [(expression, body)], else_body).
+
+    As in Twig, the first newline after a tag is removed and a "-" inside
+    the tag delimiters removes the whitespace on that side.
+    """
+    nodes = []
+    body, stack = nodes, []  # stack: [(node, parent body)] of open blocks
+    pos, trim = 0, False
+    for m in TWIG_TAGS.finditer(template):
+        kind, left, content, right, _, newline = m.groups()
+        text = template[pos:m.start()]
+        if trim:
+            text = text.lstrip()
+        if left:
+            text = text.rstrip()
+        if text:
+            body.append(text)
+        pos, trim = m.end(), bool(right)
+        if kind == '{' and newline:  # Not removed after a print tag.
+            pos -= 1
+
+        word, _, rest = content.strip().partition(' ')
+        if kind == '#':
+            continue
+        if kind == '{':
+            body.append(('print', _expression(content)))
+        elif word == 'for':
+            name, _, sequence = rest.partition(' in ')
+            node = ('for', name.strip(), _expression(sequence), [], [])
+            body.append(node)
+            stack.append((node, body))
+            body = node[3]
+        elif word == 'if':
+            node = ('if', [(_expression(rest), [])], [])
+            body.append(node)
+            stack.append((node, body))
+            body = node[1][0][1]
+        elif word == 'elseif' and stack and stack[-1][0][0] == 'if':
+            stack[-1][0][1].append((_expression(rest), []))
+            body = stack[-1][0][1][-1][1]
+        elif word == 'else' and stack:
+            body = stack[-1][0][-1]
+        elif word in ('endfor', 'endif') and stack and \
+                stack[-1][0][0] == word[3:]:
+            body = stack.pop()[1]
+        else:
+            raise ValueError(f'Unsupported Twig tag: "{content.strip()}"')
+
+    if stack:
+        raise ValueError(f'Unclosed Twig tag: "{stack[-1][0][0]}"')
+    if text := template[pos:].lstrip() if trim else template[pos:]:
+        body.append(text)
+    return nodes
+
+
+def _render(nodes, context, out):
+    for node in nodes:
+        if isinstance(node, str):
+            out.append(node)
+        elif node[0] == 'print':
+            out.append(_string(node[1](context)))
+        elif node[0] == 'for':
+            _, name, sequence, body, else_body = node
+            items = list(sequence(context) or [])
+            for i, item in enumerate(items):
+                loop = {'index': i + 1, 'index0': i,
+                        'revindex': len(items) - i,
+                        'revindex0': len(items) - i - 1,
+                        'first': i == 0, 'last': i == len(items) - 1,
+                        'length': len(items)}
+                _render(body, {**context, name: item, 'loop': loop}, out)
+            if not items:
+                _render(else_body, context, out)
+        else:
+            _, branches, else_body = node
+            for condition, body in branches:
+                if _truthy(condition(context)):
+                    _render(body, context, out)
+                    break
+            else:
+                _render(else_body, context, out)
+
+
+def render(template, context):
+    """Renders the template with the subset of Twig used by CodeRunner
+    templates.
+
+    Supports {{ expression }} (see _expression), {% for %}/{% else %},
+    {% if %}/{% elseif %}/{% else %}, {# comments #} and whitespace control.
+    Raises ValueError for unsupported constructs.
+
+    Args:
+      - template: string with the Twig template.
+      - context: dict with the template variables (e.g. STUDENT_ANSWER and
+                 TESTCASES).
+    """
+    out = []
+    _render(_parse(template), context, out)
+    return ''.join(out)
+#######################################################################
+
+
+# Graders: grader(got, expected) returns whether the test case passed.
+def _clean(text):
+    # Trailing whitespace removed from each line, and trailing blank lines.
+    return '\n'.join(line.rstrip()
+                     for line in text.replace('\r\n', '\n').split('\n')
+                     ).rstrip('\n')
+
+
+def _clean_near(text):
+    # Case and whitespace insensitive, ignoring blank lines.
+    return '\n'.join(' '.join(words) for line in text.lower().splitlines()
+                     if (words := line.split()))
+
+
+GRADERS = {
+    'EqualityGrader': lambda got, expected: _clean(got) == _clean(expected),
+    'NearEqualityGrader': lambda got, expected: (_clean_near(got) ==
+                                                 _clean_near(expected)),
+    'RegexGrader': lambda got, expected: bool(re.search(expected, got,
+                                                        re.M | re.S))}
+
+
+def _splitter(setting):
+    """Returns the compiled regex for a PHP-style "testsplitterre" setting
+    (e.g. "|#<ab@17943918#@>#\\n|ms").
+    """
+    delimiter, end = setting[0], setting.rindex(setting[0])
+    flags = 0
+    for flag in setting[end + 1:]:
+        flags |= {'i': re.I, 'm': re.M, 's': re.S, 'x': re.X}.get(flag, 0)
+    return re.compile(setting[1:end], flags)
+
+
+def _limits(cpu_limit, mem_limit):
+    """Returns the function that sets the resource limits in the child."""
+    def set_limits():
+        import resource
+
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_limit, cpu_limit + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (mem_limit << 20,) * 2)
+        resource.setrlimit(resource.RLIMIT_FSIZE, (FILE_LIMIT << 20,) * 2)
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    return set_limits
+
+
+def _sandbox(tmp_dir, source, code, stdin):
+    """Writes the source code and standard input to the temporary directory,
+    returning the dict {name: file} of the program's standard streams.
+    """
+    files = {name: os.path.join(tmp_dir, f'.{name}')
+             for name in ('stdin', 'stdout', 'stderr')}
+    with open(os.path.join(tmp_dir, source), 'w') as f:
+        f.write(code)
+    with open(files['stdin'], 'w') as f:
+        f.write(stdin)
+    return files
+
+
+def _result(files, status, timed_out):
+    """Returns the tuple (output, error) of a finished program (see
+    execute), given its exit status (negative if killed by a signal).
+
+    Paths in the temporary directory (e.g. in tracebacks) are made relative
+    to it, so results do not depend on the run (see Cache).
+    """
+    tmp_dir = os.path.join(os.path.dirname(files['stdout']), '')
+
+    def read(name):
+        with open(files[name], errors='replace') as f:
+            return f.read().replace(tmp_dir, '')
+
+    output, error = read('stdout'), read('stderr')
+    if timed_out:
+        error = f'{error}{TIMEOUT_ERROR}'
+    elif status < 0:
+        error = f'{error}Killed by signal {-status}\n'
+    elif status and not error:
+        error = f'Exit status {status}\n'
+    return output, error
+
+
+def execute(code, stdin='', language='python3', cpu_limit=CPU_LIMIT,
+            mem_limit=MEM_LIMIT):
+    """Runs the code in a sandboxed subprocess.
+
+    The program runs in an empty temporary directory, with isolated
+    environment, limited CPU time, memory and file size (the output is
+    written to files, so it is also limited).
+
+    Returns the tuple (output, error), where error is an empty string if the
+    program ran successfully, or its error output (and status) otherwise.
+
+    Args:
+      - code: string with the source code.
+      - stdin: string with the standard input.
+               (default: '')
+      - language: key in LANGUAGES.
+                  (default: 'python3')
+      - cpu_limit: CPU time limit, in seconds.
+                   (default: CPU_LIMIT)
+      - mem_limit: memory limit, in MB.
+                   (default: MEM_LIMIT)
+    """
+    import signal
+    import tempfile
+
+    if language not in LANGUAGES:
+        raise ValueError(f'Unsupported language: "{language}"')
+    source, command = LANGUAGES[language]
+
+    with tempfile.TemporaryDirectory(prefix='coderunner_') as tmp_dir:
+        files = _sandbox(tmp_dir, source, code, stdin)
+        with open(files['stdin']) as f_in, \
+                open(files['stdout'], 'w') as f_out, \
+                open(files['stderr'], 'w') as f_err:
+            process = subprocess.Popen(
+                command, stdin=f_in, stdout=f_out, stderr=f_err,
+                cwd=tmp_dir, env={'HOME': tmp_dir, 'LANG': 'C.UTF-8'},
+                preexec_fn=_limits(cpu_limit, mem_limit),
+                start_new_session=True)
+            try:
+                status = process.wait(timeout=3 * cpu_limit)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                status = process.wait()
+                timed_out = True
+            else:
+                timed_out = status == -signal.SIGXCPU
+
+        return _result(files, status, timed_out)
+
+
+#######################################################################
+# Warm workers.
+def _exec_main(code, file):
+    """Runs the code as the __main__ module, as the interpreter would for
+    the file, returning the exit status.
+    """
+    import atexit
+    import builtins
+    import traceback
+    import types
+
+    atexit._clear()  # Inherited from the worker (e.g. the sandbox cleanup).
+    main = types.ModuleType('__main__')
+    main.__file__, main.__builtins__ = file, builtins
+    main.__annotations__, main.__cached__ = {}, None
+    sys.modules['__main__'], sys.argv = main, [os.path.basename(file)]
+    try:
+        exec(compile(code, file, 'exec'), main.__dict__)
+        status = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            status = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException as e:  # Without this function's frame.
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        status = 1
+
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception as e:  # As the interpreter does.
+            print(f'Exception ignored in: {stream!r}', file=sys.stderr)
+            traceback.print_exception(type(e), e, None)
+            status = status or 120
+    return status
+
+
+def _fork(code, stdin, cpu_limit, mem_limit, protocol_fds):
+    """Runs the code in a forked child of the worker (see Worker), with the
+    same sandbox as execute.
+
+    Returns the tuple (output, error) (see execute).
+    """
+    import select
+    import signal
+    import tempfile
+
+    source = LANGUAGES['python3'][0]
+    with tempfile.TemporaryDirectory(prefix='coderunner_') as tmp_dir:
+        files = _sandbox(tmp_dir, source, code, stdin)
+        if (pid := os.fork()) == 0:  # Child.
+            status = 1
+            try:
+                os.setsid()
+                for fd in protocol_fds:
+                    os.close(fd)
+                for fd, (name, flags) in enumerate((
+                        ('stdin', os.O_RDONLY),
+                        ('stdout', os.O_WRONLY | os.O_CREAT),
+                        ('stderr', os.O_WRONLY | os.O_CREAT))):
+                    os.dup2(os.open(files[name], flags, 0o644), fd)
+                os.chdir(tmp_dir)
+                os.environ.clear()
+                os.environ.update(HOME=tmp_dir, LANG='C.UTF-8')
+                _limits(cpu_limit, mem_limit)()
+                status = _exec_main(code, os.path.join(tmp_dir, source))
+            finally:
+                os._exit(status)
+
+        pid_fd = os.pidfd_open(pid)
+        try:
+            finished, _, _ = select.select([pid_fd], [], [], 3 * cpu_limit)
+        finally:
+            os.close(pid_fd)
+        if not finished:
+            os.killpg(pid, signal.SIGKILL)
+        status = os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+        timed_out = not finished or status == -signal.SIGXCPU
+        return _result(files, status, timed_out)
+
+
+def _serve():
+    """Worker main loop: runs the (pickled) jobs read from the standard
+    input, writing each (pickled) result to the standard output.
+    """
+    import pickle
+    import traceback  # Preloaded for the templates (see pretty_tb).
+
+    requests = os.fdopen(os.dup(0), 'rb')
+    responses = os.fdopen(os.dup(1), 'wb')
+    null = os.open(os.devnull, os.O_RDWR)
+    os.dup2(null, 0)
+    os.dup2(null, 1)
+    os.close(null)
+
+    protocol_fds = (requests.fileno(), responses.fileno())
+    while True:
+        try:
+            job = pickle.load(requests)
+        except EOFError:
+            break
+        pickle.dump(_fork(*job, protocol_fds), responses)
+        responses.flush()
+
+
+class Worker:
+    """Pre-started interpreter that runs Python programs in forked children.
+
+    Each program runs in a child forked from the worker, in the same
+    sandbox as execute (temporary directory, environment and limits) and
+    as the __main__ module, so the interpreter startup is paid only once.
+    Other languages, and memory limits below WARM_MEM_LIMIT (where the
+    memory inherited from the worker would make a difference), run as in
+    execute, as does everything on platforms without os.fork and
+    os.pidfd_open (see WARM), where no worker is started.
+
+    Usage:
+        with Worker() as worker:
+            output, error = worker.execute(code, stdin)
+    """
+
+    def __init__(self):
+        self._start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _start(self):
+        if not WARM:
+            self._process = None
+            return
+        self._process = subprocess.Popen(
+            [sys.executable, '-I', '-c',
+             'import sys; sys.path.insert(0, sys.argv[1]); import runner; '
+             'sys.path.pop(0); runner._serve()',
+             os.path.dirname(os.path.abspath(__file__))],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            env={'LANG': 'C.UTF-8'})
+
+    def close(self):
+        """Stops the worker."""
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass  # Already stopped.
+        self._process.wait()
+        self._process.stdout.close()
+
+    def execute(self, code, stdin='', language='python3',
+                cpu_limit=CPU_LIMIT, mem_limit=MEM_LIMIT):
+        """Runs the code in a forked child (see execute)."""
+        import pickle
+
+        if (self._process is None or language != 'python3'
+                or mem_limit < WARM_MEM_LIMIT):
+            return execute(code, stdin, language, cpu_limit, mem_limit)
+
+        try:
+            pickle.dump((code, stdin, cpu_limit, mem_limit),
+                        self._process.stdin)
+            self._process.stdin.flush()
+            return pickle.load(self._process.stdout)
+        except (EOFError, OSError):  # Worker killed (e.g. by the program).
+            self.close()
+            self._start()
+            return '', WORKER_ERROR
+#######################################################################
+
+
+#######################################################################
+# Result cache.
+class Cache:
+    """Cache (SQLite file) of program results, for deterministic runs.
+
+    Results are keyed by a hash of the program (the rendered template, with
+    answer and test code), its standard input, language, limits, the Python
+    version and CACHE_VERSION, so identical submissions and repeated
+    regrades reuse previous runs. Results that depend on timing (time limit
+    exceeded or killed) are not stored. When closed, the entries used
+    longest ago are removed until the cache fits in max_size (LRU eviction).
+
+    Attributes:
+      - hits: number of runs found in the cache.
+      - misses: number of runs executed (not found in the cache).
+
+    Usage:
+        with Cache() as cache:
+            output, error = cache.execute(execute, code, stdin)
+    """
+
+    def __init__(self, file=CACHE_FILE, max_size=CACHE_MAX_SIZE):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(os.path.abspath(file)), exist_ok=True)
+        self.max_size, self.hits, self.misses = max_size, 0, 0
+        self._db = sqlite3.connect(file, timeout=60)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS results (key BLOB '
+                             'PRIMARY KEY, output TEXT, error TEXT, '
+                             'size INTEGER, used REAL)')
+            self._db.execute('CREATE INDEX IF NOT EXISTS results_used ON '
+                             'results (used)')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Evicts the entries used longest ago (see evict) and closes the
+        cache file.
+        """
+        self.evict()
+        self._db.close()
+
+    def evict(self):
+        """Removes the entries used longest ago, keeping the most recently
+        used ones whose results fit in max_size (in MB).
+
+        Returns the number of entries removed.
+        """
+        with self._db:
+            return self._db.execute(
+                'DELETE FROM results WHERE key IN (SELECT key FROM (SELECT '
+                'key, SUM(size) OVER (ORDER BY used DESC, key) AS kept FROM '
+                'results) WHERE kept > ?)', (self.max_size * 2**20,)).rowcount
+
+    def execute(self, run_code, code, stdin='', language='python3',
+                cpu_limit=CPU_LIMIT, mem_limit=MEM_LIMIT):
+        """Returns the result of running the code (see execute), from the
+        cache if available, otherwise calling run_code (e.g. execute or
+        Worker.execute) and storing its result.
+        """
+        import hashlib
+        import time
+
+        key = hashlib.sha256(json.dumps(
+            [code, stdin, language, cpu_limit, mem_limit, sys.version,
+             CACHE_VERSION]).encode()).digest()
+        row = self._db.execute('SELECT output, error FROM results WHERE '
+                               'key = ?', (key,)).fetchone()
+        if row is not None:
+            self.hits += 1
+            with self._db:
+                self._db.execute('UPDATE results SET used = ? WHERE key = ?',
+                                 (time.time(), key))
+            return row
+
+        self.misses += 1
+        output, error = run_code(code, stdin, language, cpu_limit, mem_limit)
+        if not (error.endswith(TIMEOUT_ERROR) or
+                error.startswith(WORKER_ERROR) or
+                'Killed by signal' in error):  # Timing dependent.
+            with self._db:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)',
+                    (key, output, error, len(output) + len(error),
+                     time.time()))
+        return output, error
+#######################################################################
+
+
+def prototypes(file):
+    """Returns a dict {coderunnertype: settings} with the prototypes
+    (prototypetype 2) in the XML file, where settings is a dict
+    {setting: value} of the PROTOTYPE_SETTINGS.
+    """
+    found = {}
+    for question in ET.parse(file).getroot():
+        if question.get('type') == 'coderunner' and \
+                question.findtext('prototypetype') == '2':
+            found[question.findtext('coderunnertype')] = {
+                setting: question.findtext(setting) or ''
+                for setting in PROTOTYPE_SETTINGS}
+    return found
+
+
+def settings(question, prototypes={}):
+    """Returns a dict with the question's PROTOTYPE_SETTINGS, inheriting
+    empty ones from its prototype (or BUILTIN_PROTOTYPES).
+
+    Raises ValueError if there is no template to use.
+    """
+    prototype = {**BUILTIN_PROTOTYPES, **prototypes}.get(
+        question.findtext('coderunnertype'), {})
+    values = {}
+    for setting in PROTOTYPE_SETTINGS:
+        values[setting] = question.findtext(setting) or ''
+        if not values[setting].strip():
+            values[setting] = prototype.get(setting, '')
+    if question.findtext('template', '').strip():  # Not inherited.
+        values['iscombinatortemplate'] = question.findtext(
+            'iscombinatortemplate', '')
+
+    if not values['template'].strip():
+        raise ValueError('Prototype not found for type '
+                         f'"{question.findtext("coderunnertype")}"')
+    return values
+
+
+def testcases(question):
+    """Returns the list of test cases of the question, each a dict with its
+    attributes and fields (testcode, stdin, expected, extra, display).
+    """
+    return [{**test.attrib,
+             **{field.tag: field.findtext('text') or '' for field in test}}
+            for test in question.findall('testcases/testcase')]
+
+
+def _grader(values):
+    """Returns the grader (see GRADERS) of the question's settings.
+
+    Raises ValueError if it is not supported.
+    """
+    if (grader := GRADERS.get(values['grader'] or 'EqualityGrader')) is None:
+        raise ValueError(f'Unsupported grader: "{values["grader"]}"')
+    return grader
+
+
+def _context(question, values, answer=None):
+    """Returns the template variables (without the test cases) for running
+    the answer (or the question's answer, if None).
+    """
+    if answer is None:
+        answer = question.findtext('answer') or ''
+    context = json.loads(values['templateparams'] or '{}')
+    context.update(STUDENT_ANSWER=answer, IS_PRECHECK='0',
+                   QUESTION={'name': question.findtext('name/text'),
+                             'answer': question.findtext('answer') or ''})
+    return context
+
+
+def check(question, prototypes={}):
+    """Checks that the question can be run (see run), without running it:
+    resolves its prototype, looks up its grader and language, and renders
+    its template with the question's answer and test cases.
+
+    Raises ValueError (as run) if the question cannot be run.
+
+    Args:
+      - question: Element with the CodeRunner question.
+      - prototypes: dict with the available prototypes (see prototypes).
+                    (default: {})
+    """
+    values = settings(question, prototypes)
+    _grader(values)
+    if (language := values['language'] or 'python3') not in LANGUAGES:
+        raise ValueError(f'Unsupported language: "{language}"')
+    tests, context = testcases(question), _context(question, values)
+    if values['iscombinatortemplate'] == '1':
+        render(values['template'], {**context, 'TESTCASES': tests})
+    for test in tests:
+        if values['iscombinatortemplate'] == '1':
+            render(values['template'], {**context, 'TESTCASES': [test]})
+        else:
+            render(values['template'], {**context, 'TEST': test})
+
+
+def run(question, answer=None, prototypes={}, cpu_limit=None, worker=None,
+        cache=None):
+    """Runs the answer against the test cases of the question.
+
+    Combinator templates are run once for all tests, splitting the output
+    with the "testsplitterre" setting. As in CodeRunner, each test runs
+    separately if tests have standard input (and multiple stdins are not
+    allowed), or if the combined run fails or its output cannot be split.
+
+    Returns the tuple (grade, results), where grade is the fraction (between
+    0 and 1) of the test case marks obtained and results is the list of
+    (got, passed) tuples for each test case.
+
+    Args:
+      - question: Element with the CodeRunner question.
+      - answer: string with the answer to run.
+                (default: None, for the question's answer)
+      - prototypes: dict with the available prototypes (see prototypes).
+                    (default: {})
+      - cpu_limit: CPU time limit (in seconds) for each run.
+                   (default: None, for the question's limit or CPU_LIMIT)
+      - worker: Worker used to run the code.
+                (default: None, for a new interpreter per run)
+      - cache: Cache with the results of previous runs.
+               (default: None, for running every time)
+    """
+    values = settings(question, prototypes)
+    tests = testcases(question)
+    grader = _grader(values)
+    limits = (values['language'] or 'python3',
+              cpu_limit or int(float(values['cputimelimitsecs'] or
+                                     CPU_LIMIT)),
+              int(float(values['memlimitmb'] or MEM_LIMIT)))
+    context = _context(question, values, answer)
+    combinator = values['iscombinatortemplate'] == '1'
+    run_code = execute if worker is None else worker.execute
+    if cache is not None:
+        run_code = functools.partial(cache.execute, run_code)
+
+    outputs = None
+    if combinator and tests and (values['allowmultiplestdins'] == '1' or
+                                 not any(test['stdin'] for test in tests)):
+        code = render(values['template'], {**context, 'TESTCASES': tests})
+        output, error = run_code(code, '', *limits)
+        if not error:
+            parts = _splitter(values['testsplitterre'] or
+                              SPLITTER).split(output)
+            if len(parts) == len(tests):
+                outputs = parts
+
+    if outputs is None:
+        outputs = []
+        for test in tests:
+            if combinator:
+                code = render(values['template'],
+                              {**context, 'TESTCASES': [test]})
+            else:
+                code = render(values['template'], {**context, 'TEST': test})
+            output, error = run_code(code, test['stdin'], *limits)
+            if error:
+                output = f'{output}{RUN_ERROR}{error}'
+            outputs.append(output)
+
+    results = [(got, grader(got, test['expected']))
+               for got, test in zip(outputs, tests)]
+    marks = [float(test.get('mark') or 1) for test in tests]
+    if values['allornothing'] == '1' and not all(p for _, p in results):
+        return 0.0, results
+    total = sum(marks)
+    grade = sum(m for m, (_, p) in zip(marks, results) if p)
+    return (grade / total if total else 0.0), results
+
+
+def main():
+    """Process command line arguments.
+
+    Runs the answer of every (non-prototype) CodeRunner question in the
+    given files, printing the tests that fail and a summary.
+    """
+
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    parser.add_argument('files', nargs='+',
+                        help='Quiz XML files (or directories with them).')
+    parser.add_argument('-p', '--prototypes', nargs='*', default=[],
+                        help='XML files with the prototypes used.')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Show the output of failed tests.')
+    parser.add_argument('--cold', action='store_true',
+                        help='Start a new interpreter per run, instead of '
+                             'forking from a warm worker (see Worker).')
+    parser.add_argument('--no_cache', dest='cache', action='store_false',
+                        help='Do not use the cache of results.')
+    parser.add_argument('--cache_file', default=CACHE_FILE,
+                        help='SQLite file with the cache of results.')
+    args = parser.parse_args()
+
+    available = {}
+    for file in [os.path.join(os.path.dirname(__file__),
+                              'python3_try_except.xml')] + args.prototypes:
+        available.update(prototypes(file))
+
+    summary = {'passed': 0, 'failed': 0, 'error': 0}
+    worker = None if args.cold else Worker()
+    cache = Cache(args.cache_file) if args.cache else None
+    for file in checklist._xml_files(args.files):
+        available_here = {**available, **prototypes(file)}
+        category = None
+        for question in ET.parse(file).getroot():
+            category = checklist._category(question, category)
+            if not checklist._is_coderunner(question):
+                continue
+
+            name = question.findtext('name/text')
+            title = f'{category or "[No category]"} > {name}'
+            try:
+                runs = cache and (cache.hits, cache.misses)
+                grade, results = run(question, prototypes=available_here,
+                                     worker=worker, cache=cache)
+            except ValueError as e:
+                print(f'{title}: {e}.')
+                summary['error'] += 1
+                continue
+
+            passed = sum(p for _, p in results)
+            summary['passed' if grade == 1 else 'failed'] += 1
+            hit_rate = ''
+            if cache is not None:
+                hits = cache.hits - runs[0]
+                total = hits + cache.misses - runs[1]
+                hit_rate = f', cache hits {hits}/{total}'
+            print(f'{title}: {passed}/{len(results)} tests passed (grade '
+                  f'{grade:.2f}{hit_rate}).')
+            if args.verbose:
+                for t, ((got, p), test) in enumerate(zip(results,
+                                                         testcases(question))):
+                    if not p:
+                        print(f'\tTest case {t + 1}: expected '
+                              f'{test["expected"]!r}, got {got!r}')
+
+    if worker is not None:
+        worker.close()
+    if cache is not None:
+        cache.close()
+
+    print('\nQuestions:')
+    checklist._print_dict(summary)
+
+
+if __name__ == '__main__':
+    main()
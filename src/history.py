@@ -0,0 +1,336 @@
+"""Histórico de impressões digitais das respostas de questionários.
+
+Mantém um acervo (apenas de inclusão) com as impressões digitais (veja o
+módulo winnowing) das respostas gravadas por moodle.quiz.responses.write,
+organizado por disciplina/período/questionário/questão, permitindo comparar
+novas submissões com as de semestres anteriores sem carregar todo o
+histórico na memória.
+
+Cada inclusão grava um segmento, arquivo binário imutável com:
+    - 8 bytes: tamanho do cabeçalho (inteiro little-endian);
+    - cabeçalho JSON (completado com espaços até múltiplo de 8 bytes), com
+      os discentes e o tamanho de cada impressão digital, além dos
+      parâmetros (ext, k, window) usados;
+    - hashes (uint64) de todas as impressões digitais, ordenados;
+    - índice (uint32) do discente de cada hash.
+
+Os segmentos são mapeados em memória (mmap) na leitura, e a busca de cada
+hash é feita por bisseção nos hashes ordenados.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+import hashlib
+import json
+import mmap
+import os
+import sys
+
+import winnowing
+
+
+DEFAULT_DIR = os.path.join(os.environ.get('XDG_DATA_HOME',
+                                          os.path.join(os.path.expanduser('~'),
+                                                       '.local', 'share')),
+                           'cic-tools', 'history')
+EXT = '.fp'
+
+
+class Segment:
+    """Segmento do histórico mapeado em memória.
+
+    Atributos:
+    owners -- lista com a matrícula de cada discente do segmento.
+    sizes -- lista com o tamanho da impressão digital de cada discente.
+    params -- dicionário com os parâmetros (ext, k, window) das impressões.
+    hashes -- sequência ordenada dos hashes (memoryview 'Q').
+    indexes -- sequência com o índice do discente de cada hash.
+    """
+
+    def __init__(self, file):
+        with open(file, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        size = int.from_bytes(self._mmap[:8], 'little')
+        header = json.loads(self._mmap[8:8 + size])
+        self.owners, self.sizes = header['owners'], header['sizes']
+        self.params = header['params']
+
+        start, n = 8 + size, header['count']
+        self._views = [memoryview(self._mmap)]
+        self.hashes = self._views[0][start:start + 8 * n].cast('Q')
+        self.indexes = self._views[0][start + 8 * n:start + 12 * n].cast('I')
+        self._views += [self.hashes, self.indexes]
+        if header['byteorder'] != sys.byteorder:  # Cópia, sem mmap.
+            self.hashes, self.indexes = array('Q', self.hashes), array(
+                'I', self.indexes)
+            self.hashes.byteswap()
+            self.indexes.byteswap()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Libera o mapeamento em memória."""
+        self.hashes = self.indexes = None
+        for view in reversed(self._views):
+            view.release()
+        self._mmap.close()
+
+    def lookup(self, h):
+        """Retorna os índices dos discentes que têm o hash fornecido."""
+        i = bisect_left(self.hashes, h)
+        j = bisect_right(self.hashes, h, i)
+        return self.indexes[i:j].tolist()
+
+
+def path(course, period, quiz, question, root=DEFAULT_DIR):
+    """Retorna o diretório dos segmentos de uma questão.
+
+    Argumentos:
+    course -- código da disciplina.
+    period -- período (AAAA-P).
+    quiz -- nome do questionário.
+    question -- índice da questão no questionário.
+    root -- diretório do histórico.
+            (default DEFAULT_DIR)
+    """
+    return os.path.join(root, course, period, quiz, f'Q{question}')
+
+
+def keys(root=DEFAULT_DIR, course=None):
+    """Retorna a lista de tuplas (disciplina, período, questionário, questão)
+    com segmentos no histórico, opcionalmente restrita a uma disciplina.
+    """
+    found = []
+    for dir_path, _, files in os.walk(root):
+        if any(file.endswith(EXT) for file in files):
+            key = os.path.relpath(dir_path, root).split(os.sep)
+            if len(key) == 4 and key[-1].startswith('Q'):
+                key[-1] = key[-1][1:]
+                if course is None or key[0] == course:
+                    found.append(tuple(key))
+    return sorted(found)
+
+
+def periods(course, quiz, question, root=DEFAULT_DIR):
+    """Retorna a lista ordenada dos períodos com segmentos de uma questão,
+    listando apenas os períodos da disciplina (sem percorrer o histórico).
+    """
+    course_dir = os.path.join(root, course)
+    if not os.path.isdir(course_dir):
+        return []
+    return sorted(period for period in os.listdir(course_dir)
+                  if os.path.isdir(path(course, period, quiz, question, root)))
+
+
+def load(course, period, quiz, question, root=DEFAULT_DIR):
+    """Retorna a lista de segmentos (veja Segment) de uma questão."""
+    q_dir = path(course, period, quiz, question, root)
+    if not os.path.isdir(q_dir):
+        return []
+    return [Segment(os.path.join(q_dir, file))
+            for file in sorted(os.listdir(q_dir)) if file.endswith(EXT)]
+
+
+def fingerprints(q_dir, ext='py', k=winnowing.K, window=winnowing.WINDOW):
+    """Retorna um dicionário {matrícula: hashes} com as impressões digitais
+    das respostas gravadas em um diretório (ou arquivo zip) de questão.
+
+    Os hashes da resposta correta (CORRECT.ext), se houver, são removidos de
+    todas as impressões digitais.
+    """
+    sources = winnowing.read_sources(q_dir, ext)
+    prints = {file[:-len(ext) - 1]: winnowing.fingerprints(
+                  winnowing.tokens(code, ext), k, window).keys()
+              for file, code in sources.items()}
+    base = prints.pop('CORRECT', set())
+    return {s_id: sorted(hashes - base) for s_id, hashes in prints.items()}
+
+
+def add(prints, course, period, quiz, question, root=DEFAULT_DIR,
+        params={}):
+    """Acrescenta as impressões digitais ao histórico, gravando um novo
+    segmento para a questão.
+
+    Discentes que já estão no histórico da questão (com os mesmos parâmetros)
+    não são acrescentados novamente.
+
+    Retorna a quantidade de discentes acrescentados.
+
+    Argumentos:
+    prints -- dicionário {matrícula: hashes} (veja fingerprints).
+    course -- código da disciplina.
+    period -- período (AAAA-P).
+    quiz -- nome do questionário.
+    question -- índice da questão no questionário.
+    root -- diretório do histórico.
+            (default DEFAULT_DIR)
+    params -- dicionário com os parâmetros (ext, k, window) das impressões.
+              (default {})
+    """
+    archived = set()
+    for segment in load(course, period, quiz, question, root):
+        with segment:
+            if segment.params == params:
+                archived.update(segment.owners)
+
+    owners = sorted(s_id for s_id, hashes in prints.items()
+                    if hashes and s_id not in archived)
+    if not owners:
+        return 0
+
+    records = sorted((h, i) for i, s_id in enumerate(owners)
+                     for h in set(prints[s_id]))
+    hashes = array('Q', (h for h, _ in records))
+    indexes = array('I', (i for _, i in records))
+    header = json.dumps({'owners': owners,
+                         'sizes': [len(set(prints[s_id])) for s_id in owners],
+                         'params': params, 'count': len(records),
+                         'byteorder': sys.byteorder}).encode()
+    header += b' ' * (-(8 + len(header)) % 8)
+    content = b''.join([len(header).to_bytes(8, 'little'), header,
+                        hashes.tobytes(), indexes.tobytes()])
+
+    q_dir = path(course, period, quiz, question, root)
+    os.makedirs(q_dir, exist_ok=True)
+    file = os.path.join(q_dir, f'{hashlib.sha256(content).hexdigest()}{EXT}')
+    tmp_file = f'{file}.{os.getpid()}'
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_file, file)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+    return len(owners)
+
+
+def search(prints, course, quiz, question, exclude=(), root=DEFAULT_DIR,
+           params={}, max_share=winnowing.MAX_SHARE, threshold=0):
+    """Compara as impressões digitais com o histórico da mesma questão em
+    outros períodos.
+
+    Retorna uma lista de tuplas (matrícula, percentual1, período, matrícula,
+    percentual2), em ordem decrescente de similaridade, onde o percentual de
+    cada discente indica o quanto de sua impressão digital é compartilhada
+    com o outro.
+
+    Argumentos:
+    prints -- dicionário {matrícula: hashes} (veja fingerprints).
+    course -- código da disciplina.
+    quiz -- nome do questionário.
+    question -- índice da questão no questionário.
+    exclude -- períodos a serem desconsiderados (ex: o atual).
+               (default ())
+    root -- diretório do histórico.
+            (default DEFAULT_DIR)
+    params -- dicionário com os parâmetros (ext, k, window) das impressões.
+              (default {})
+    max_share -- fração máxima de discentes de um segmento com o mesmo hash
+                 para que seja considerado (veja winnowing.share_limit).
+                 (default winnowing.MAX_SHARE)
+    threshold -- percentual mínimo de similaridade (em algum dos discentes)
+                 para que o par seja incluído.
+                 (default 0)
+    """
+    matches = []
+    for period in periods(course, quiz, question, root):
+        if period in exclude:
+            continue
+
+        for segment in load(course, period, quiz, question, root):
+            with segment:
+                if segment.params != params:
+                    continue
+
+                limit = winnowing.share_limit(len(segment.owners),
+                                              max_share)
+                for s_id, hashes in prints.items():
+                    shared = Counter()
+                    for h in hashes:
+                        if len(found := segment.lookup(h)) <= limit:
+                            shared.update(found)
+                    for i, count in shared.items():
+                        p1 = 100 * count // len(hashes)
+                        p2 = 100 * count // segment.sizes[i]
+                        if p1 >= threshold or p2 >= threshold:
+                            matches.append((s_id, p1, period,
+                                            segment.owners[i], p2))
+
+    return sorted(matches, key=lambda m: (-max(m[1], m[4]), m[0], m[2], m[3]))
+
+
+def main():
+    """Processa argumentos da linha de comando."""
+
+    from argparse import ArgumentParser
+
+    def question_args(args):
+        return args.course, args.period, args.quiz, args.question
+
+    def params(args):
+        return {'ext': args.ext, 'k': winnowing.K, 'window': winnowing.WINDOW}
+
+    def parse_add(args):
+        added = add(fingerprints(args.path, args.ext), *question_args(args),
+                    args.archive_dir, params(args))
+        print(f'{added} respostas acrescentadas.')
+
+    def parse_search(args):
+        for s_id, p1, period, other, p2 in search(
+                fingerprints(args.path, args.ext), args.course, args.quiz,
+                args.question, [args.period], args.archive_dir,
+                params(args), threshold=args.threshold):
+            print(f'{s_id} ({p1}%), {period}/{other} ({p2}%)')
+
+    def parse_list(args):
+        for key in keys(args.archive_dir, args.course):
+            segments = load(*key, args.archive_dir)
+            owners = sum(len(segment.owners) for segment in segments)
+            for segment in segments:
+                segment.close()
+            print(f'{"/".join(key)}: {owners} respostas')
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('-d', '--archive_dir', default=DEFAULT_DIR,
+                        help='Diretório do histórico.')
+    subparsers = parser.add_subparsers(help='Opções de comandos.')
+
+    list_parser = subparsers.add_parser('list',
+                                        help='Lista as questões no '
+                                             'histórico.')
+    list_parser.add_argument('course', nargs='?',
+                             help='Código da disciplina.')
+    list_parser.set_defaults(func=parse_list)
+
+    for name, func, doc in (('add', parse_add, add.__doc__),
+                            ('search', parse_search, search.__doc__)):
+        sub_parser = subparsers.add_parser(name, help=doc.split('\n')[0])
+        sub_parser.add_argument('path',
+                                help='Diretório com as respostas da questão '
+                                     '(veja moodle.quiz.responses.write).')
+        sub_parser.add_argument('course', help='Código da disciplina.')
+        sub_parser.add_argument('period', help='Período (AAAA-P).')
+        sub_parser.add_argument('quiz', help='Nome do questionário.')
+        sub_parser.add_argument('question', help='Índice da questão.')
+        sub_parser.add_argument('-e', '--ext', default='py',
+                                help='Extensão do tipo de arquivo.')
+        sub_parser.add_argument('-t', '--threshold', type=int, default=30,
+                                help='Limiar de similaridade percentual.')
+        sub_parser.set_defaults(func=func)
+
+    args = parser.parse_args()
+    if 'func' in args:
+        args.func(args)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
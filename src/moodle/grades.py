@@ -16,8 +16,9 @@ import csv
 import unicodedata
 
 
-def read(file, total_only=False):
-    """Lê os dados do arquivo e os retorna como um dicionário.
+def _rows(file, total_only=False):
+    """Itera pelas linhas do arquivo, gerando tuplas (matrícula, nome,
+    atividades, notas), onde atividades e notas são listas de textos.
 
     Argumentos:
     file -- o arquivo CSV a ser lido.
@@ -25,7 +26,6 @@ def read(file, total_only=False):
                   (total).
     """
     EMAIL_IDX, FIRST_GRADE_IDX = 5, 7
-    grades = {}
     with open(file) as csvfile:
         csvreader = csv.reader(csvfile, delimiter=',', quotechar='"')
 
@@ -40,19 +40,48 @@ def read(file, total_only=False):
         else:
             grades_idx = range(FIRST_GRADE_IDX, len(header))
 
-        header = [h.replace(' (Real)', '') for h in header]
+        activities = [header[i].replace(' (Real)', '') for i in grades_idx]
 
         for row in csvreader:
             if row[EMAIL_IDX]:
                 s_id, _ = row[EMAIL_IDX].split('@')
-                grades[s_id] = {'Name': f'{row[0]} {row[1]}', 'Grades': {}}
-                for i in grades_idx:
-                    grade = '0' if row[i] == '-' else row[i]
-                    grades[s_id]['Grades'][header[i]] = grade
+                yield (s_id, f'{row[0]} {row[1]}', activities,
+                       [row[i] for i in grades_idx])
+
+
+def read(file, total_only=False):
+    """Lê os dados do arquivo e os retorna como um dicionário.
 
+    Argumentos:
+    file -- o arquivo CSV a ser lido.
+    total_only -- booleano indicando se considera apenas as notas consolidadas
+                  (total).
+    """
+    grades = {}
+    for s_id, name, activities, values in _rows(file, total_only):
+        grades[s_id] = {'Name': name,
+                        'Grades': {activity: '0' if value == '-' else value
+                                   for activity, value in zip(activities,
+                                                              values)}}
     return grades
 
 
+def load(file, total_only=False):
+    """Lê os dados do arquivo e os retorna como uma matriz (moodle.store).
+
+    As atividades são identificadas pelo nome e notas ausentes ('-') são
+    armazenadas como NaN.
+
+    Argumentos:
+    file -- o arquivo CSV a ser lido.
+    total_only -- booleano indicando se considera apenas as notas consolidadas
+                  (total).
+    """
+    from moodle.store import Store
+
+    return Store.from_rows(_rows(file, total_only))
+
+
 def main():
     """Processa argumentos da linha de comando."""
 
@@ -11,29 +11,67 @@ Para obter o arquivo:
 Apenas o arquivo HTML é necessário.
 """
 
+import html
 import re
 
 
+CHUNK_SIZE = 1 << 20
+ROW_PATTERN = re.compile(r'<label for=[^>]*?user\d+')  # Início de cada linha.
+PARTICIPANT_PATTERN = re.compile(
+    r'<label for=.*?user\d+.*?<img.*?>(.*?)</a>.*?'
+    r'>([\d\w]*?)@(aluno\.)?.*?\..*?<[.\s\S]*?'
+    r'"Atribuições de papéis.*?>[\s\S] *(\w.*)[\s\S]'
+    r'[.\s\S]*?'
+    r'"Editar grupos.*?>[\s\S] *(\w.*)[\s\S]')
+
+
+def _rows(htmlfile):
+    """Itera pelos trechos do HTML correspondentes a cada linha da tabela de
+    participantes, do <label> de seleção do usuário até o da linha seguinte.
+
+    O arquivo é lido em partes de CHUNK_SIZE caracteres, mantendo apenas o
+    trecho da linha ainda incompleta entre uma parte e outra.
+    """
+    buffer = ''
+    while True:
+        chunk = htmlfile.read(CHUNK_SIZE)
+        buffer += chunk
+        starts = [m.start() for m in ROW_PATTERN.finditer(buffer)]
+        if not chunk:
+            starts.append(len(buffer))
+        for start, end in zip(starts, starts[1:]):
+            yield buffer[start:end]
+        if not chunk:
+            return
+
+        if starts:
+            buffer = buffer[starts[-1]:]
+        else:  # Mantém um possível início de linha incompleto.
+            buffer = buffer[buffer.rfind('<'):] if '<' in buffer else ''
+
+
 def read(file, group='', role='Estudante'):
     """Lê os dados do arquivo e os retorna como um dicionário.
 
+    O arquivo é processado em partes, uma linha da tabela por vez, de modo
+    que a memória usada não depende do tamanho da página e a busca de cada
+    participante não ultrapassa a sua linha.
+
     Argumentos:
     file -- o arquivo HTML a ser lido.
     group -- nome [parcial] do grupo desejado.
     role -- papel [parcial] definido.
             (default Estudante)
     """
+    participants = {}
     with open(file) as htmlfile:
-        html = htmlfile.read()
-
-    pattern = re.compile(r'<label for=.*?user\d+.*?<img.*?>(.*?)</a>.*?'
-                         r'>([\d\w]*?)@(aluno\.)?.*?\..*?<[.\s\S]*?'
-                         r'"Atribuições de papéis.*?>[\s\S] *(\w.*)[\s\S]'
-                         r'[.\s\S]*?'
-                         r'"Editar grupos.*?>[\s\S] *(\w.*)[\s\S]')
-    return {s_id: {'Name': name, 'Role': s_role, 'Group': s_group}
-            for name, s_id, is_aluno, s_role, s_group in pattern.findall(html)
-            if group in s_group and role in s_role}
+        for row in _rows(htmlfile):
+            if m := PARTICIPANT_PATTERN.search(row):
+                name, s_id, _, s_role, s_group = m.groups()
+                if group in s_group and role in s_role:
+                    participants[s_id] = {'Name': html.unescape(name),
+                                          'Role': s_role, 'Group': s_group}
+    return participants
 
 
 def main():
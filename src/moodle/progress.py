@@ -12,6 +12,29 @@ Para obter o arquivo:
 import csv
 
 
+COMPLETED = 'Concluído'
+
+
+def _rows(file):
+    """Itera pelas linhas do arquivo, gerando tuplas (matrícula, nome,
+    atividades, situações), onde atividades e situações são listas. A situação
+    de cada atividade é 1 se foi completada e 0 caso contrário.
+
+    Argumentos:
+    file -- o arquivo CSV a ser lido.
+    """
+    with open(file) as csvfile:
+        csvreader = csv.reader(csvfile, delimiter=',', quotechar='"')
+
+        header = next(csvreader)  # skip header
+        activities = header[2::2]
+
+        for row in csvreader:
+            s_id, _ = row[1].split('@')
+            yield (s_id, row[0], activities,
+                   [int(status == COMPLETED) for status in row[2::2]])
+
+
 def read(file, info):
     """Lê os dados do arquivo e os retorna como um dicionário.
 
@@ -28,13 +51,41 @@ def read(file, info):
 
         for row in csvreader:
             s_id, _ = row[1].split('@')
-            frequency = 100 * row.count('Concluído') // activities
+            frequency = 100 * row.count(COMPLETED) // activities
             progress[s_id] = {'Name': row[0],
                               'Frequência': frequency,
                               'Faltas': 100 - frequency}
     return progress
 
 
+def load(file, info):
+    """Lê os dados do arquivo e os retorna como uma matriz (moodle.store).
+
+    O valor de cada atividade é 1 se foi completada e 0 caso contrário (veja
+    frequency).
+
+    Argumentos:
+    file -- o arquivo CSV a ser lido.
+    info -- string descrevendo o arquivo.
+    """
+    from moodle.store import Store
+
+    return Store.from_rows(_rows(file))
+
+
+def frequency(progress, s_id):
+    """Retorna o percentual de atividades completadas pelo discente, ou None
+    se o discente não consta na matriz.
+
+    Argumentos:
+    progress -- matriz (moodle.store) com o progresso dos discentes.
+    s_id -- matrícula do discente.
+    """
+    if s_id not in progress or not progress.activities:
+        return None
+    return int(100 * sum(progress.row(s_id))) // len(progress.activities)
+
+
 def main():
     """Processa argumentos da linha de comando."""
 
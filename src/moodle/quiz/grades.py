@@ -13,8 +13,10 @@ import csv
 import unicodedata
 
 
-def read(file, quiz, total_only=False):
-    """Lê os dados do arquivo e os retorna como um dicionário.
+def _rows(file, quiz, total_only=False):
+    """Itera pelas linhas do arquivo, gerando tuplas (matrícula, nome,
+    questões, notas), onde questões e notas são listas. As notas são
+    normalizadas (entre 0 e 1) ou None, se ausentes ('-').
 
     Argumentos:
     file -- o arquivo CSV a ser lido.
@@ -22,16 +24,10 @@ def read(file, quiz, total_only=False):
     total_only -- booleano indicando se considera apenas as notas consolidadas
                   (total).
     """
-    def parse(header, grade_info):
+    def parse(header):
         question, weight = header.split(' /')
-        if grade_info == '-':
-            grade = 0
-        else:
-            grade = (float(grade_info.replace(',', '.')) /
-                     float(weight.replace(',', '.')))
-        return question.split()[-1], grade
+        return question.split()[-1], float(weight.replace(',', '.'))
 
-    grades = {}
     with open(file) as csvfile:
         csvreader = csv.reader(csvfile, delimiter=',', quotechar='"')
 
@@ -44,16 +40,62 @@ def read(file, quiz, total_only=False):
         else:
             grades_idx = range(8, len(header))  # 8 is 1st occurrence of grade.
 
+        # Questões e pesos interpretados uma única vez (e as mesmas questões
+        # em todas as linhas).
+        weights = [(i, parse(header[i])[1]) for i in grades_idx]
+        questions = [parse(header[i])[0] for i in grades_idx]
         for row in csvreader:
             if row[2]:
                 s_id, _ = row[2].split('@')
-                grades[s_id] = {'Name': f'{row[1]} {row[0]}', quiz: {}}
-                for i in grades_idx:
-                    question, grade = parse(header[i], row[i])
-                    grades[s_id][quiz][question] = grade
+                yield (s_id, f'{row[1]} {row[0]}', questions,
+                       [None if row[i] == '-' else
+                        float(row[i].replace(',', '.')) / weight
+                        for i, weight in weights])
+
+
+def read(file, quiz, total_only=False):
+    """Lê os dados do arquivo e os retorna como um dicionário.
+
+    Argumentos:
+    file -- o arquivo CSV a ser lido.
+    quiz -- nome do questionário sendo processado.
+    total_only -- booleano indicando se considera apenas as notas consolidadas
+                  (total).
+    """
+    grades = {}
+    for s_id, name, questions, values in _rows(file, quiz, total_only):
+        grades[s_id] = {'Name': name,
+                        quiz: {question: 0 if grade is None else grade
+                               for question, grade in zip(questions, values)}}
     return grades
 
 
+def load(file, quiz, total_only=False):
+    """Lê os dados do arquivo e os retorna como uma matriz (moodle.store).
+
+    As atividades são identificadas pela tupla (questionário, questão) e
+    notas ausentes ('-') são armazenadas como NaN.
+
+    Argumentos:
+    file -- o arquivo CSV a ser lido.
+    quiz -- nome do questionário sendo processado.
+    total_only -- booleano indicando se considera apenas as notas consolidadas
+                  (total).
+    """
+    from moodle.store import MISSING, Store
+
+    def rows():
+        last = activities = None
+        for s_id, name, questions, grades in _rows(file, quiz, total_only):
+            if questions is not last:
+                last, activities = questions, [(quiz, question)
+                                               for question in questions]
+            yield (s_id, name, activities,
+                   [MISSING if grade is None else grade for grade in grades])
+
+    return Store.from_rows(rows())
+
+
 def main():
     """Processa argumentos da linha de comando."""
 
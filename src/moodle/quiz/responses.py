@@ -14,6 +14,86 @@ from argparse import ArgumentParser
 import os
 
 
+ARCHIVE_EXT = '.zip'
+BATCH_SIZE = 256  # Arquivos por tarefa de gravação (veja write).
+CHUNK_SIZE = 1 << 16
+
+
+def _rows(file):
+    """Retorna um gerador com as linhas (listas) do relatório, lidas
+    incrementalmente do arquivo JSON (cujo conteúdo é [[linha, ...]]).
+
+    Apenas uma linha é mantida em memória por vez, independentemente do
+    tamanho do arquivo.
+    """
+    import json
+
+    def fill():
+        nonlocal buffer, pos
+        chunk = f.read(max(CHUNK_SIZE, len(buffer) - pos))
+        buffer, pos = buffer[pos:] + chunk, 0
+        if not chunk:
+            raise ValueError(f'{file}: unexpected end of JSON data')
+
+    def next_char(expected):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                break
+            fill()
+        if (char := buffer[pos]) not in expected:
+            raise ValueError(f'{file}: unexpected {char!r} in JSON data')
+        return char
+
+    decoder = json.JSONDecoder()
+    with open(file) as f:
+        buffer, pos = '', 0
+        for expected in '[[':
+            next_char(expected)
+            pos += 1
+
+        if next_char('[]') == '[':
+            while True:
+                try:
+                    row, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    fill()  # Linha incompleta.
+                    continue
+
+                yield row
+                if next_char(',]') == ']':
+                    break
+                pos += 1
+                next_char('[')
+
+
+def stream(file, quiz):
+    """Lê os dados do arquivo incrementalmente, retornando um gerador de
+    tuplas (matrícula, dados), um discente por vez.
+
+    Os dados de cada discente têm a mesma estrutura dos valores do dicionário
+    retornado por read. Cada resposta correta distinta é armazenada uma única
+    vez, sendo compartilhada pelos dados de todos os discentes.
+
+    Argumentos:
+    file -- o arquivo JSON a ser lido.
+    quiz -- o nome do questionário.
+    """
+    def shared(answer):
+        return answers.setdefault(answer, answer)
+
+    answers = {}
+    for d in _rows(file):
+        s_id, _ = d[2].split('@')  # e-mail
+        yield s_id, {'Name': f'{d[1]} {d[0]}',
+                     quiz: {str(q + 1): {
+                                'attempt': d[i].strip(' \r\n'),
+                                'answer': shared(d[i + 1].strip(' \r\n'))}
+                            for q, i in enumerate(range(8, len(d), 2))}}
+
+
 def read(file, quiz):
     """Lê os dados do arquivo e os retorna como um dicionário.
 
@@ -26,42 +106,82 @@ def read(file, quiz):
     file -- o arquivo JSON a ser lido.
     quiz -- o nome do questionário.
     """
-    responses = {}
-    with open(file) as f:
-        import json
-        data = json.load(f)
+    return dict(stream(file, quiz))
 
-    for d in data[0]:
-        s_id, _ = d[2].split('@')  # e-mail
-        responses[s_id] = {'Name': f'{d[1]} {d[0]}',
-                           quiz: {str(q + 1): {'attempt': d[i].strip(' \r\n'),
-                                               'answer': d[i + 1].strip(' \r\n')}
-                                  for q, i in enumerate(range(8, len(d), 2))}}
-    return responses
+
+def _write_files(files, skip_unchanged=False):
+    """Grava os arquivos e retorna a quantidade de arquivos gravados.
+
+    Argumentos:
+    files -- lista de tuplas (arquivo, conteúdo).
+    skip_unchanged -- booleano indicando se arquivos já existentes com o
+                      mesmo conteúdo devem ser mantidos (sem gravar).
+                      (default False)
+    """
+    written = 0
+    for file, content in files:
+        if skip_unchanged:
+            try:
+                with open(file) as f:
+                    if f.read() == content:
+                        continue
+            except OSError:
+                pass  # Arquivo novo.
+
+        with open(file, 'w') as f:
+            f.write(content)
+        written += 1
+    return written
 
 
-def write(responses, output_path, ext='py', ignore=[], header_extra={}):
+def write(responses, output_path, ext='py', ignore=[], header_extra={},
+          jobs=4, skip_unchanged=False, verbose=False, archive=False):
     """Grava a resposta de um aluno para cada questão em um arquivo específico.
 
     Cria uma estrutura de diretórios criada para armazenar os arquivos que
     segue as hierarquia das chaves do dicionário de respostas:
         output_path > Nome do Questionário > Questão
 
-    Retorna uma lista com os diretórios (um por questão) onde os arquivos são
-    gravados.
+    Retorna uma lista ordenada com os diretórios (um por questão) onde os
+    arquivos são gravados.
 
     Sendo fornecida a informação, inclui turma do aluno e nota da questão no
     cabeçalho do arquivo.
 
+    Cada diretório é criado (e sua resposta correta gravada) uma única vez, e
+    os arquivos são gravados em lotes (de BATCH_SIZE arquivos) distribuídos
+    entre threads.
+
+    Se archive, as respostas de cada questão são gravadas em um único arquivo
+    zip sem compressão (Questão.zip, veja extract) em vez de um diretório, e
+    são retornados os arquivos zip.
+
     Argumentos:
-    responses -- dicionario com a informação das respostas (veja a função read).
+    responses -- dicionario com a informação das respostas (veja a função read),
+                 ou iterável de tuplas (matrícula, dados) (veja a função
+                 stream).
     output_path -- diretório para armazenar os arquivos.
     ext -- extensão do arquivo a conter a resposta.
     ignore -- lista com índices de questões que devem ser ignoradas.
     header_extra -- dicionário no formato {student_id: {quiz: {questions: [info1, info2, ...]}}} com
                     informações a serem acrescentadas ao final do cabeçalho do
                     arquivo de resposta da questão.
+    jobs -- quantidade de threads para gravação dos arquivos.
+            (default 4)
+    skip_unchanged -- booleano indicando se arquivos já existentes com o
+                      mesmo conteúdo devem ser mantidos (sem gravar).
+                      (default False)
+    verbose -- booleano indicando se apresenta a quantidade de arquivos
+               gravados por segundo.
+               (default False)
+    archive -- booleano indicando se as respostas de cada questão devem ser
+               gravadas em um único arquivo zip.
+               (default False)
     """
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+    import time
+
     def has_response(content):
         return content.count('\n') > 1
 
@@ -75,31 +195,159 @@ def write(responses, output_path, ext='py', ignore=[], header_extra={}):
 
         return ' '.join(student_info)
 
-    all_output_paths = set()
-    for s_id, info in responses.items():
-        for key in info:
-            if key == 'Name':
-                continue
+    def entries():
+        seen = set()
+        for s_id, info in responses:
+            for key in info:
+                if key == 'Name':
+                    continue
 
-            for q, src in info[key].items():
-                student = ([info['Name'], s_id] +
-                           header_extra.get(s_id, {}).get(key, {}).get(q, []))
+                for q, src in info[key].items():
+                    if (q in ignore or
+                            not has_response(src.get('attempt', ''))):
+                        continue
 
-                if (q not in ignore and has_response(src.get('attempt', ''))):
                     q_dir = os.path.join(output_path, key, f'Q{q}')
-                    os.makedirs(q_dir, exist_ok=True)
-                    response_file = os.path.join(q_dir, f'{s_id}.{ext}')
-                    with open(response_file, 'w') as f:
-                        f.write(f'{make_header(student, ext)}'
-                                f'\n\n{src["attempt"]}')
+                    if q_dir not in seen:
+                        seen.add(q_dir)
+                        yield q_dir, f'CORRECT.{ext}', src['answer']
 
-                    response_file = os.path.join(q_dir, f'CORRECT.{ext}')
-                    if not os.path.isfile(response_file):
-                        with open(response_file, 'w') as f:
-                            f.write(src['answer'])
+                    student = ([info['Name'], s_id] +
+                               header_extra.get(s_id, {}).get(key, {}).get(
+                                   q, []))
+                    yield (q_dir, f'{s_id}.{ext}',
+                           f'{make_header(student, ext)}'
+                           f'\n\n{src["attempt"]}')
+
+    def batches():
+        batch = []
+        for q_dir, name, content in entries():
+            file = os.path.join(q_dir, name)
+            if q_dir not in all_output_paths:
+                os.makedirs(q_dir, exist_ok=True)
+                all_output_paths.add(q_dir)
+                if os.path.isfile(file):  # Resposta correta já existente.
+                    continue
+            batch.append((file, content))
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    if isinstance(responses, dict):
+        responses = responses.items()
+
+    start, total, written = time.perf_counter(), 0, 0
+    all_output_paths = set()
+    if archive:
+        total, written, all_output_paths = _write_archives(entries(),
+                                                           skip_unchanged)
+    else:
+        with ThreadPoolExecutor(jobs) as executor:
+            pending = deque()
+            for batch in batches():
+                total += len(batch)
+                pending.append(executor.submit(_write_files, batch,
+                                               skip_unchanged))
+                if len(pending) > 2 * jobs:  # Limita os lotes em memória.
+                    written += pending.popleft().result()
+            written += sum(future.result() for future in pending)
 
-                    all_output_paths.add(q_dir)
-    return all_output_paths
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print(f'{written} files written ({total - written} unchanged) in '
+              f'{elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} files/s)')
+    return sorted(all_output_paths)
+
+
+def _write_archives(entries, skip_unchanged=False):
+    """Grava as respostas de cada questão em um único arquivo zip (sem
+    compressão), cujo nome é o diretório da questão acrescido de ARCHIVE_EXT.
+
+    Os arquivos zip são reprodutíveis (data fixa), de modo que um arquivo já
+    existente com o mesmo conteúdo pode ser mantido.
+
+    Retorna a tupla (quantidade de arquivos, quantidade de arquivos gravados,
+    conjunto de arquivos zip).
+
+    Cada arquivo zip é gravado em um arquivo temporário, que substitui o
+    original ao final, e os temporários são removidos se houver falha.
+
+    Argumentos:
+    entries -- iterável de tuplas (diretório da questão, nome, conteúdo).
+    skip_unchanged -- booleano indicando se arquivos zip já existentes com o
+                      mesmo conteúdo devem ser mantidos (sem gravar).
+                      (default False)
+    """
+    from contextlib import suppress
+    import filecmp
+    import zipfile
+
+    archives, counts = {}, {}  # {arquivo zip: ZipFile}, {arquivo zip: n}
+    written = 0
+    try:
+        for q_dir, name, content in entries:
+            archive = f'{q_dir}{ARCHIVE_EXT}'
+            if archive not in archives:
+                os.makedirs(os.path.dirname(archive), exist_ok=True)
+                archives[archive] = zipfile.ZipFile(
+                    f'{archive}.{os.getpid()}', 'w', zipfile.ZIP_STORED)
+                counts[archive] = 0
+            info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+            info.external_attr = 0o644 << 16
+            archives[archive].writestr(info, content)
+            counts[archive] += 1
+        for zip_file in archives.values():
+            zip_file.close()
+
+        for archive, zip_file in archives.items():
+            if (skip_unchanged and os.path.isfile(archive) and
+                    filecmp.cmp(zip_file.filename, archive, shallow=False)):
+                os.remove(zip_file.filename)
+            else:
+                os.replace(zip_file.filename, archive)
+                written += counts[archive]
+    except BaseException:
+        for zip_file in archives.values():  # Remove os temporários.
+            with suppress(Exception):
+                zip_file.close()
+            with suppress(OSError):
+                os.remove(zip_file.filename)
+        raise
+    return sum(counts.values()), written, set(archives)
+
+
+def extract(archive, names=None, output_path=None):
+    """Extrai respostas de um arquivo zip de questão (veja write).
+
+    Apenas os arquivos solicitados são lidos, por acesso direto (usando o
+    índice do arquivo zip), sem extrair os demais.
+
+    Retorna um dicionário {nome: conteúdo} com os arquivos extraídos.
+
+    Argumentos:
+    archive -- arquivo zip com as respostas da questão.
+    names -- lista com os nomes dos arquivos a serem extraídos (ex:
+             matrícula.py), ou None para todos.
+             (default None)
+    output_path -- diretório onde gravar os arquivos extraídos, ou None para
+                   não gravá-los.
+                   (default None)
+    """
+    import zipfile
+
+    contents = {}
+    with zipfile.ZipFile(archive) as zip_file:
+        for name in zip_file.namelist() if names is None else names:
+            contents[name] = zip_file.read(name).decode()
+
+    if output_path is not None:
+        os.makedirs(output_path, exist_ok=True)
+        for name, content in contents.items():
+            with open(os.path.join(output_path, name), 'w') as f:
+                f.write(content)
+    return contents
 
 
 def main():
@@ -116,12 +364,24 @@ def main():
             print(f'{info["Name"]} ({s_id}): {quizzes}')
 
     def parse_write(args):
-        responses = read(args.file, args.quiz)
-        for path in write(responses, args.output_path, args.ext, args.ignore):
+        responses = stream(args.file, ' '.join(args.quiz))
+        for path in write(responses, args.output_path, args.ext, args.ignore,
+                          jobs=args.jobs, skip_unchanged=args.skip_unchanged,
+                          verbose=True, archive=args.zip):
             print(path)
 
+    def parse_extract(args):
+        contents = extract(args.file, args.names or None, args.output_path)
+        if args.output_path is None:
+            for name, content in contents.items():
+                print(f'==> {name} <==\n{content}')
+        else:
+            for name in contents:
+                print(os.path.join(args.output_path, name))
+
     parser = ArgumentParser(read.__doc__.split('\n')[0])
-    parser.add_argument('file', help='O arquivo JSON a ser lido.')
+    parser.add_argument('file', help='O arquivo JSON a ser lido (ou o '
+                                     'arquivo zip, para extract).')
     parser.add_argument('-q', '--quiz', nargs='+', default=['Questionário'],
                         help='O nome do questionário.')
     parser.set_defaults(func=parse_read)
@@ -136,8 +396,27 @@ def main():
     write_parser.add_argument('ignore', type=int, nargs='+',
                               help='Índices de questões que devem ser '
                                    'ignoradas.')
+    write_parser.add_argument('-j', '--jobs', type=int, default=4,
+                              help='Quantidade de threads para gravação dos '
+                                   'arquivos.')
+    write_parser.add_argument('-u', '--skip_unchanged', action='store_true',
+                              help='Manter arquivos já existentes com o mesmo '
+                                   'conteúdo.')
+    write_parser.add_argument('-z', '--zip', action='store_true',
+                              help='Gravar as respostas de cada questão em um '
+                                   'único arquivo zip.')
     write_parser.set_defaults(func=parse_write)
 
+    extract_parser = subparsers.add_parser('extract',
+                                           help=extract.__doc__.split('\n')[0])
+    extract_parser.add_argument('names', nargs='*',
+                                help='Nomes dos arquivos a serem extraídos '
+                                     '(default todos).')
+    extract_parser.add_argument('-o', '--output_path',
+                                help='Diretório onde gravar os arquivos '
+                                     '(default apresentar o conteúdo).')
+    extract_parser.set_defaults(func=parse_extract)
+
     args = parser.parse_args()
     args.func(args)
 
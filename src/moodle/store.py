@@ -0,0 +1,165 @@
+"""Armazenamento compacto de relatórios de atividades por discente.
+
+Os relatórios são mantidos como uma matriz discente x atividade, armazenada
+em colunas (uma por atividade) de valores float32 (array 'f'). Valores
+ausentes no relatório ('', '-' ou '?') são armazenados como NaN.
+
+Para reproduzir o texto de cada valor no relatório (veja Store.format), cada
+coluna tem também a quantidade de casas decimais de cada valor (array 'b'),
+ou um código negativo que identifica o texto do valor ausente.
+
+Os discentes e as atividades são identificados por índices (dicionários) que
+definem a linha e a coluna correspondentes na matriz.
+"""
+
+from array import array
+import math
+
+
+MISSING = float('nan')
+MISSING_TEXTS = ('', '-', '?')  # Código -1 - i para o i-ésimo texto.
+UNSET = -1  # Código de valores não definidos (texto vazio).
+NUMBER = 127  # Código de valores definidos como número (não como texto).
+
+
+def _parse(value):
+    """Retorna a tupla (valor, código) do texto fornecido, onde o código é
+    a quantidade de casas decimais ou, se o valor estiver ausente, -1 - i
+    para o i-ésimo texto de MISSING_TEXTS.
+    """
+    if value in MISSING_TEXTS:
+        return MISSING, -1 - MISSING_TEXTS.index(value)
+
+    value = value.replace(',', '.')
+    _, _, decimals = value.partition('.')
+    return float(value), len(decimals)
+
+
+class Store:
+    """Matriz discente x atividade.
+
+    Atributos:
+    students -- dicionário {matrícula: linha}.
+    names -- lista com o nome de cada discente (por linha).
+    activities -- dicionário {atividade: coluna}.
+    columns -- lista com os valores de cada atividade (array 'f', por coluna).
+    decimals -- lista com os códigos (casas decimais no relatório, veja
+                _parse) dos valores de cada atividade (array 'b', por coluna).
+    """
+
+    def __init__(self):
+        self.students, self.names = {}, []
+        self.activities, self.columns, self.decimals = {}, [], []
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Cria a matriz a partir das linhas de um relatório.
+
+        Argumentos:
+        rows -- iterável de tuplas (matrícula, nome, atividades, valores),
+                onde valores são números ou textos como exportados pelo
+                Moodle.
+        """
+        store, last, columns = cls(), None, []
+        for s_id, name, activities, values in rows:
+            row = store.add_student(s_id, name)
+            if activities is not last and activities != last:
+                # Em geral, as mesmas atividades em todas as linhas.
+                last = activities
+                columns = [(store.columns[col], store.decimals[col])
+                           for col in map(store.add_activity, activities)]
+            for (column, decimals), value in zip(columns, values):
+                if isinstance(value, str):
+                    value, code = _parse(value)
+                else:
+                    code = NUMBER if value == value else UNSET  # NaN != NaN
+                column[row], decimals[row] = value, code
+        return store
+
+    def __contains__(self, s_id):
+        return s_id in self.students
+
+    def __len__(self):
+        return len(self.students)
+
+    def add_student(self, s_id, name):
+        """Acrescenta o discente (se necessário) e retorna sua linha."""
+        if (row := self.students.get(s_id)) is None:
+            row = self.students[s_id] = len(self.names)
+            self.names.append(name)
+            for column, decimals in zip(self.columns, self.decimals):
+                column.append(MISSING)
+                decimals.append(UNSET)
+        return row
+
+    def add_activity(self, activity):
+        """Acrescenta a atividade (se necessário) e retorna sua coluna."""
+        if (col := self.activities.get(activity)) is None:
+            col = self.activities[activity] = len(self.columns)
+            self.columns.append(array('f', [MISSING]) * len(self.names))
+            self.decimals.append(array('b', [UNSET]) * len(self.names))
+        return col
+
+    def set(self, s_id, activity, value):
+        """Define o valor da atividade para o discente (já acrescentado).
+
+        O valor pode ser um número ou um texto como exportado pelo Moodle.
+        """
+        self._set(self.students[s_id], self.add_activity(activity), value)
+
+    def _set(self, row, col, value):
+        """Define o valor na linha e coluna fornecidas (veja set)."""
+        if isinstance(value, str):
+            value, code = _parse(value)
+        else:
+            code = UNSET if math.isnan(value) else NUMBER
+        self.columns[col][row] = value
+        self.decimals[col][row] = code
+
+    def get(self, s_id, activity, default=None):
+        """Retorna o valor da atividade para o discente (NaN se ausente no
+        relatório), ou default se o discente ou a atividade não existem.
+        """
+        if (row := self.students.get(s_id)) is None:
+            return default
+        if (col := self.activities.get(activity)) is None:
+            return default
+        return self.columns[col][row]
+
+    def name(self, s_id):
+        """Retorna o nome do discente."""
+        return self.names[self.students[s_id]]
+
+    def row(self, s_id):
+        """Retorna uma lista com os valores das atividades do discente."""
+        row = self.students[s_id]
+        return [column[row] for column in self.columns]
+
+    def format(self, s_id, activity):
+        """Retorna o valor da atividade para o discente como texto, como no
+        relatório: com as mesmas casas decimais do valor ou, se ausente, com
+        o mesmo texto ('', '-' ou '?'). Valores definidos como número usam a
+        menor representação (formato 'g').
+        """
+        row, col = self.students.get(s_id), self.activities.get(activity)
+        if row is None or col is None:
+            return ''
+        code = self.decimals[col][row]
+        if code < 0:
+            return MISSING_TEXTS[-1 - code]
+        if code == NUMBER:
+            return f'{self.columns[col][row]:g}'
+        return f'{self.columns[col][row]:.{code}f}'
+
+    def merge(self, other):
+        """Acrescenta os discentes e atividades de outra matriz a esta."""
+        for s_id, row in other.students.items():
+            self.add_student(s_id, other.names[row])
+        for activity, col in other.activities.items():
+            dst = self.add_activity(activity)
+            for s_id, row in other.students.items():
+                if (code := other.decimals[col][row]) != UNSET:
+                    self.columns[dst][self.students[s_id]] = (
+                        other.columns[col][row])
+                    self.decimals[dst][self.students[s_id]] = code
+        return self
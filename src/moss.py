@@ -5,9 +5,17 @@ script para solicitação de análise está disponível na máquina. Mais detalh
 https://theory.stanford.edu/~aiken/moss/ .
 """
 
-from collections import defaultdict
 import os
 import re
+import time
+
+
+CHUNK_SIZE = 1 << 16
+MAX_ROW_SIZE = 1 << 12  # Tamanho máximo de uma linha da tabela.
+RETRIES, BACKOFF = 3, 1.0  # Novas tentativas e espera inicial (segundos).
+ROW_PATTERN = re.compile(r'<TR><TD><A HREF="[^"]*">([^<]*) \((\d+)%\)</A>\s*'
+                         r'<TD><A HREF="[^"]*">([^<]*) \((\d+)%\)</A>\s*'
+                         r'<TD ALIGN=right>(\d+)(?=\D)', re.IGNORECASE)
 
 
 def call(shell_options, path='.', ext='py'):
@@ -25,17 +33,14 @@ def call(shell_options, path='.', ext='py'):
 
     import subprocess
 
-    working_dir = os.getcwd()
-    os.chdir(path)
     try:
         shell_cmd = ' '.join(['moss'] + shell_options + [f'*.{ext}'])
-        cp = subprocess.run(shell_cmd, shell=True, stdout=subprocess.PIPE)
+        cp = subprocess.run(shell_cmd, shell=True, stdout=subprocess.PIPE,
+                            cwd=path)
 
         url = cp.stdout.decode().split('\n')[-2]
     except Exception:
         url = ''
-    finally:
-        os.chdir(working_dir)
 
     return url if url.startswith('http') else None
 
@@ -59,49 +64,162 @@ def get_report(url, out_file):
         with open(out_file, 'w', encoding='utf-8') as f:
             f.writelines(html.replace('Moss Results', f'Moss Results - {url}'))
         return True
-    except urllib.error.HTTPError as e:
+    except OSError as e:  # Inclui urllib.error.URLError e HTTPError.
         print(e)
 
     return False
 
 
-def similar(moss_report, threshold=30):
+def _retry(func, retries, backoff, *args):
+    """Chama func(*args) até que retorne um valor verdadeiro, esperando
+    backoff * 2**i segundos antes da i-ésima nova tentativa, e retorna o
+    último resultado.
+    """
+    for attempt in range(retries + 1):
+        if (result := func(*args)) or attempt == retries:
+            return result
+        time.sleep(backoff * 2 ** attempt)
+
+
+def run(tasks, shell_options, ext='py', jobs=4, retries=RETRIES,
+        backoff=BACKOFF):
+    """Submete os diretórios ao MOSS concorrentemente, obtendo cada relatório
+    assim que sua url é retornada.
+
+    Retorna um gerador de tuplas (diretório, url, arquivo), na ordem em que
+    são concluídas, onde url é None se não foi possível obtê-la e arquivo é
+    '' se não foi possível obter o relatório.
+
+    Argumentos:
+    tasks -- iterável de tuplas (diretório, arquivo), com o diretório onde
+             estão os arquivos para serem analisados e o arquivo onde salvar
+             o relatório.
+    shell_options -- opções a serem fornecidas ao script (veja call).
+    ext -- extensão do tipo de arquivo a ser analisado.
+           (default 'py')
+    jobs -- quantidade máxima de submissões simultâneas.
+            (default 4)
+    retries -- quantidade de novas tentativas em caso de falha.
+               (default RETRIES)
+    backoff -- espera (em segundos) antes da primeira nova tentativa, que
+               dobra a cada tentativa.
+               (default BACKOFF)
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    def submit(path, out_file):
+        url = _retry(call, retries, backoff, shell_options, path, ext)
+        if url and _retry(get_report, retries, backoff, url, out_file):
+            return path, url, out_file
+        return path, url, ''
+
+    with ThreadPoolExecutor(jobs) as executor:
+        futures = [executor.submit(submit, *task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _file_name(path):
+    """Retorna o nome do arquivo, sem o caminho e a extensão."""
+    _, tail = os.path.split(path)
+    name, _ = os.path.splitext(tail)
+    return name
+
+
+def pairs(moss_report, threshold=0):
+    """Lê um relatório gerado pelo MOSS e retorna um gerador de tuplas
+    (arquivo1, percentual1, arquivo2, percentual2, linhas) de cada par de
+    arquivos do relatório com similaridade maior ou igual ao limiar (em algum
+    dos arquivos).
+
+    O arquivo é lido em blocos (de CHUNK_SIZE caracteres), de modo que não é
+    necessário mantê-lo todo em memória.
+
+    Argumentos:
+    moss_report -- caminho para o arquivo HTML com o relatório MOSS.
+    threshold -- o limiar de similaridade percentual.
+                 (default 0)
+    """
+    def rows(text):
+        nonlocal end
+        for m in ROW_PATTERN.finditer(text):
+            file1, p1, file2, p2, lines = m.groups()
+            if int(p1) >= threshold or int(p2) >= threshold:
+                yield file1, int(p1), file2, int(p2), int(lines)
+            end = m.end()
+
+    with open(moss_report, 'r', encoding='utf-8', errors='replace') as f:
+        buffer = ''
+        while chunk := f.read(CHUNK_SIZE):
+            buffer, end = buffer + chunk, 0
+            yield from rows(buffer)
+            # Mantém apenas o que pode ser o início de uma linha incompleta.
+            buffer = buffer[max(end, len(buffer) - MAX_ROW_SIZE):]
+        yield from rows(f'{buffer}\n')
+
+
+def clusters(moss_report, threshold=30):
     """Lê um relatório gerado pelo MOSS e agrupa os arquivos similares.
 
-    Retorna uma lista com grupos de submissões similares, conforme o limiar.
-    Assume que cada arquivo tem um nome único, independentemente do caminho até
-    ele.
+    Retorna uma lista de tuplas (arquivos, pares), uma para cada grupo
+    (componente conexo) de arquivos ligados por pares com similaridade maior
+    ou igual ao limiar, onde arquivos é o conjunto dos nomes dos arquivos
+    (sem caminho e extensão) e pares a lista de tuplas (arquivo1,
+    percentual1, arquivo2, percentual2, linhas) que os ligam. Os grupos
+    seguem a ordem em que aparecem no relatório.
 
     Argumentos:
-    -- moss_report: caminho para o arquivo HTML com o relatório MOSS.
-    -- threshold: o limiar de similaridade percentual.
+    moss_report -- caminho para o arquivo HTML com o relatório MOSS.
+    threshold -- o limiar de similaridade percentual.
+                 (default 30)
     """
-    def file_name(moss_report):
-        _, tail = os.path.split(moss_report)
-        name, _ = os.path.splitext(tail)
-        return name
+    def find(file):
+        while (root := parent[file]) != file:
+            parent[file] = parent[root]  # Compressão de caminho.
+            file = root
+        return file
+
+    def union(file1, file2):
+        root1, root2 = find(file1), find(file2)
+        if root1 != root2:
+            if size[root1] < size[root2]:
+                root1, root2 = root2, root1
+            parent[root2] = root1
+            size[root1] += size[root2]
 
     if not os.path.isfile(moss_report):
         return []
 
-    with open(moss_report, 'r') as f:
-        moss_html = f.read()
+    parent, size, edges = {}, {}, []
+    for file1, p1, file2, p2, lines in pairs(moss_report, threshold):
+        file1, file2 = _file_name(file1), _file_name(file2)
+        for file in (file1, file2):
+            if file not in parent:
+                parent[file], size[file] = file, 1
+        union(file1, file2)
+        edges.append((file1, p1, file2, p2, lines))
+
+    groups = {}  # {raiz: (arquivos, pares)}, na ordem do relatório.
+    for file in parent:
+        groups.setdefault(find(file), (set(), []))[0].add(file)
+    for edge in edges:
+        groups[find(edge[0])][1].append(edge)
+    return list(groups.values())
 
-    pattern = r'<TR><TD><A HREF=".*?">(.*?) \((\d\d)%\)</A>[.\s\S]*?' \
-              r'A HREF=".*?">(.*?) \((\d\d)%\)'
-    similar_files = defaultdict(list)
-    for file1, p1, file2, p2 in re.findall(pattern, moss_html, re.IGNORECASE):
-        if int(p1) >= threshold or int(p2) >= threshold:
-            file1, file2 = file_name(file1), file_name(file2)
-            similar_files[file1].append(file2)
-            similar_files[file2].append(file1)
 
-    similar_groups = []
-    for k, v in similar_files.items():
-        if (s := set([k] + v)) not in similar_groups:
-            similar_groups.append(s)
+def similar(moss_report, threshold=30):
+    """Lê um relatório gerado pelo MOSS e agrupa os arquivos similares.
 
-    return similar_groups
+    Retorna uma lista com grupos (conjuntos) de submissões similares,
+    conforme o limiar. Submissões ligadas indiretamente (A~B e B~C) ficam no
+    mesmo grupo (veja clusters). Assume que cada arquivo tem um nome único,
+    independentemente do caminho até ele.
+
+    Argumentos:
+    -- moss_report: caminho para o arquivo HTML com o relatório MOSS.
+    -- threshold: o limiar de similaridade percentual.
+    """
+    return [files for files, _ in clusters(moss_report, threshold)]
 
 
 def main():
@@ -113,10 +231,23 @@ def main():
         else:
             print(f'Houve um problema obtendo o relatório de {args.url}.')
 
+    def parse_run(args):
+        tasks = [(path, os.path.join(args.output, f'{_file_name(path)}.html'))
+                 for path in args.paths]
+        shell_options = ['-x', '-l python' if args.ext == 'py' else '']
+        for path, url, out_file in run(tasks, shell_options, args.ext,
+                                       args.jobs, args.retries):
+            if out_file:
+                print(f'{path}: {url} -> {out_file}')
+            else:
+                print(f'Houve um problema processando {path} ({url}).')
+
     def parse_similar(args):
-        groups = similar(args.report, args.threshold)
-        for i, group in enumerate(groups):
+        groups = clusters(args.report, args.threshold)
+        for i, (group, edges) in enumerate(groups):
             print(f'Grupo {i + 1}): ' + ', '.join(sorted(group)))
+            for file1, p1, file2, p2, lines in edges:
+                print(f'\t{file1} ({p1}%), {file2} ({p2}%): {lines} linhas')
 
     from argparse import ArgumentParser
 
@@ -129,6 +260,22 @@ def main():
     report_parser.add_argument('out_file', help='Caminho para o arquivo onde '
                                                 'salvar o relatório')
     report_parser.set_defaults(func=parse_report)
+    run_parser = subparsers.add_parser('run', help=run.__doc__.split('\n')[0])
+    run_parser.add_argument('paths', nargs='+',
+                            help='Diretórios onde estão os arquivos para '
+                                 'serem analisados.')
+    run_parser.add_argument('-o', '--output', default='.',
+                            help='Diretório onde salvar os relatórios.')
+    run_parser.add_argument('-e', '--ext', default='py',
+                            help='Extensão do tipo de arquivo a ser '
+                                 'analisado.')
+    run_parser.add_argument('-j', '--jobs', type=int, default=4,
+                            help='Quantidade máxima de submissões '
+                                 'simultâneas.')
+    run_parser.add_argument('-r', '--retries', type=int, default=RETRIES,
+                            help='Quantidade de novas tentativas em caso de '
+                                 'falha.')
+    run_parser.set_defaults(func=parse_run)
     similar_parser = subparsers.add_parser('similar',
                                            help=similar.__doc__.split('\n')[0])
     similar_parser.add_argument('report',
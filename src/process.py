@@ -6,24 +6,144 @@ Para detalhes de uso, use a opção -h na linha de comando.
 
 from argparse import ArgumentParser
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import json
 import locale
+import math
 import re
 import os
 
+import cache
+import history
 import moodle.grades
 import moodle.participants
 import moodle.progress
 import moodle.quiz.grades
 import moodle.quiz.responses
+import moodle.store
 import moss
 import teams.attendance
+import winnowing
 
 
-def _load(files):
+MANIFEST = 'manifest.json'
+READERS = {}  # {(ORIGEM, RELATORIO): (método de leitura, adaptador)}
+READERS_ENTRY_POINT = 'cic_tools.readers'
+
+
+def register(source, report, reader, adapter=None):
+    """Registra o método de leitura de um relatório.
+
+    Argumentos:
+    source -- plataforma de origem do relatório (ORIGEM, veja _load).
+    report -- tipo de relatório (RELATORIO, veja _load).
+    reader -- método que recebe o caminho do arquivo (e os argumentos
+              definidos pelo adaptador) e retorna um dicionário com as
+              informações.
+    adapter -- método que recebe a informação EXTRA do nome do arquivo e
+               retorna um dicionário com os argumentos nomeados do método de
+               leitura.
+               (default EXTRA como argumento 'info')
+    """
+    READERS[source, report] = (reader, adapter or (lambda extra: {
+        'info': extra}))
+
+
+def _register_entry_points():
+    """Registra os métodos de leitura disponibilizados por outros pacotes.
+
+    Cada entry point do grupo READERS_ENTRY_POINT deve ter nome no formato
+    ORIGEM.RELATORIO e referenciar o método de leitura ou uma tupla (método de
+    leitura, adaptador), conforme a função register.
+    """
+    from importlib.metadata import entry_points
+
+    for entry_point in entry_points(group=READERS_ENTRY_POINT):
+        source, _, report = entry_point.name.partition('.')
+        try:
+            reader = entry_point.load()
+        except Exception as e:
+            print(f'Unable to load reader "{entry_point.name}": {e}')
+            continue
+        if isinstance(reader, tuple):
+            register(source, report, *reader)
+        else:
+            register(source, report, reader)
+
+
+register('moodle', 'grades', moodle.grades.load,
+         lambda extra: {'total_only': bool(extra)})
+register('moodle', 'participants', moodle.participants.read,
+         lambda extra: {'group': extra})
+register('moodle', 'progress', moodle.progress.load)
+register('moodle', 'quiz.grades', moodle.quiz.grades.load,
+         lambda extra: {'quiz': extra})
+register('moodle', 'quiz.responses', moodle.quiz.responses.read,
+         lambda extra: {'quiz': extra})
+register('teams', 'attendance', teams.attendance.load)
+_register_entry_points()
+
+
+def _match(files, verbose=True):
+    """Retorna uma lista com as tuplas (caminho, arquivo, informações) dos
+    arquivos cujo nome segue o formato esperado (veja _load) e cujo relatório
+    tem um método de leitura registrado (veja READERS), em ordem.
+
+    As informações são a tupla (CURSO, AAAA-P, ORIGEM, RELATORIO, EXTRA, EXT).
+    """
+    def alternatives(names):
+        # Abordagem gulosa, os nomes mais longos devem ser testados primeiro.
+        return '|'.join(re.escape(name)
+                        for name in sorted(set(names), key=lambda n: -len(n)))
+
+    FILE_PATTERN = re.compile(r'([A-Z][0-Z]+)\.'                   # CURSO
+                              r'(\d{4}-[0-2])\.'                   # PERIODO
+                              fr'({alternatives(s for s, _ in READERS)})\.'
+                              fr'({alternatives(r for _, r in READERS)})'
+                              r'(?=\.)\.?(.*)?'                    # EXTRA
+                              r'\.(csv|html|json)')                # EXT
+
+    matches = []
+    for full_path in sorted(files):
+        path, file = os.path.split(full_path)
+        if (m := FILE_PATTERN.match(file)) and m.group(3, 4) in READERS:
+            matches.append((full_path, file, m.groups()))
+        elif verbose:
+            print(f'{file}: unknown report, skipping...')
+    return matches
+
+
+def _read(task):
+    """Executa o método de leitura registrado para o relatório (veja _load).
+
+    Retorna a tupla (informações, hit), onde hit indica se as informações
+    foram obtidas do cache (None caso o cache não seja usado).
+
+    Definida no nível do módulo para poder ser executada em outro processo.
+    """
+    full_path, source, report, extra, cache_dir = task
+    reader, adapter = READERS[source, report]
+    kwargs = adapter(extra)
+    if cache_dir is None:
+        return reader(full_path, **kwargs), None
+
+    key = cache.key(full_path, f'{reader.__module__}.{reader.__qualname__}',
+                    cache.version(reader), sorted(kwargs.items()))
+    hit, current = cache.get(key, cache_dir)
+    if not hit:
+        current = reader(full_path, **kwargs)
+        cache.put(key, current, cache_dir)
+    return current, hit
+
+
+def _load(files, jobs=1, cache_dir=None, cache_size=cache.DEFAULT_MAX_SIZE,
+          min_presence=teams.attendance.MIN_PRESENCE, matches=None):
     """Lê os arquivos fornecidos e retorna um dicionário com as informações.
 
     Assume que o nome do arquivo determina o relatório e, portanto, como obter
-    as informações: executando o método "read" específico.
+    as informações: executando o método de leitura registrado para a origem e
+    o relatório (veja READERS e register).
 
     Assume que os nomes dos arquivos seguem o formato:
     CURSO.AAAA-P.ORIGEM.RELATORIO.EXTRA.EXT
@@ -45,58 +165,112 @@ def _load(files):
             - quiz.responses: relatório de submissões de questionários do
                               Moodle. Neste caso, EXTRA: identifica o
                               questionário.
+            - outros relatórios registrados por outros pacotes (veja
+              _register_entry_points).
         EXTRA: informação adicional sobre o arquivo (opcional),
         EXT: extensão o arquivo.
 
     A estrutura do dicionário é: [curso][período][info]
-    """
 
-    FILE_PATTERN = re.compile(r'([A-Z][0-Z]+)\.'         # CURSO
-                              r'(\d{4}-[0-2])\.'         # PERIODO
-                              r'(moodle|teams)\.'        # ORIGEM
-                              r'(attendance|grades|'     # RELATORIO (abordagem
-                              r'participants|progress|'  # gulosa, a ordem faz
-                              r'quiz\.grades|'           # diferença)
-                              r'quiz\.responses|quiz)(?=\.)'
-                              r'\.?(.*)?'                # EXTRA (opcional)
-                              r'\.(csv|html|json)')      # EXT
-
-    data, attendance = {}, {}
-    for full_path in sorted(files):
-        path, file = os.path.split(full_path)
+    Se jobs > 1, os arquivos são lidos em paralelo (um arquivo por tarefa) por
+    um conjunto de processos. Os resultados são combinados na mesma ordem da
+    leitura sequencial, de modo que o dicionário resultante é idêntico.
+
+    Se cache_dir for fornecido, as informações de arquivos não modificados
+    desde a última leitura são obtidas do cache neste diretório, limitado a
+    cache_size MB (veja o módulo cache).
+
+    A presença (attendance) de cada discente é o percentual das reuniões do
+    período em que esteve presente por ao menos a fração min_presence da
+    duração da reunião (veja teams.attendance.Summary).
 
-        if m := FILE_PATTERN.match(file):
-            print(file)
-            course, period, source, report, extra, ext = m.groups()
-            current = eval(f'{source}.{report}.read(full_path, extra)')
-
-            if course not in data:
-                data[course] = {period: defaultdict(dict)}
-                attendance[course] = {period: {'Total': 0}}
-
-            if report == 'attendance':
-                attendance[course][period]['Total'] += 1
-                for student_id in current:
-                    attendance[course][period][student_id] += 1
-            else:
-                if report not in data[course][period]:
-                    data[course][period][report] = current
-                elif extra:
-                    for student_id, value in current.items():
-                        if student_id not in data[course][period][report]:
-                            data[course][period][report][student_id] = {}
-                        data[course][period][report][student_id].update(value)
-
-    for course, periods in attendance.items():
-        for period, info in periods.items():
-            data[course][period]['attendance'] = {
-                student_id: (100 * info.get(student_id, 0)) // info['Total']
-                for student_id in info if student_id != 'Total'}
+    Se matches for fornecido (o resultado de _match(files)), os nomes dos
+    arquivos não são interpretados novamente.
+    """
+
+    if matches is None:
+        matches = _match(files)
+    tasks = [(full_path, source, report, extra, cache_dir)
+             for full_path, _, (_, _, source, report, extra, _) in matches]
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_read, tasks))
+    else:
+        results = map(_read, tasks)
+
+    data, attendance, hits = {}, {}, []
+    for (full_path, file, groups), (current, hit) in zip(matches, results):
+        print(file)
+        hits.append(hit)
+        course, period, source, report, extra, ext = groups
+
+        data.setdefault(course, {}).setdefault(period, defaultdict(dict))
+
+        if report == 'attendance':
+            attendance.setdefault((course, period), teams.attendance.Summary(
+                min_presence)).add(current)
+        else:
+            if report not in data[course][period]:
+                data[course][period][report] = current
+            elif isinstance(current, moodle.store.Store):
+                data[course][period][report].merge(current)
+            elif extra:
+                for student_id, value in current.items():
+                    if student_id not in data[course][period][report]:
+                        data[course][period][report][student_id] = {}
+                    data[course][period][report][student_id].update(value)
+
+    for (course, period), summary in attendance.items():
+        data[course][period]['attendance'] = {
+            student_id: info['Attendance']
+            for student_id, info in summary.percentages().items()}
+
+    if cache_dir is not None:
+        cache.evict(cache_dir, cache_size)
+        print(f'Cache: {hits.count(True)} hits, {hits.count(False)} misses')
 
     return data
 
 
-def _make_csv(reports, output, num_classes, sep):
+def _digest(*contents):
+    """Retorna o hash (string) do conteúdo fornecido."""
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(content.encode() if isinstance(content, str)
+                      else content)
+    return digest.hexdigest()
+
+
+def _signature(files):
+    """Retorna um dicionário {arquivo: assinatura} que permite identificar se
+    algum dos arquivos foi modificado (tamanho e data de modificação).
+
+    Os arquivos são identificados pelo caminho absoluto, de modo que a
+    assinatura não depende do diretório de execução.
+    """
+    signature = {}
+    for file in sorted(map(os.path.abspath, files)):
+        stat = os.stat(file)
+        signature[file] = f'{stat.st_size}:{stat.st_mtime_ns}'
+    return signature
+
+
+def _read_manifest(output):
+    """Retorna o manifesto armazenado no diretório (veja main)."""
+    try:
+        with open(os.path.join(output, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(output, manifest):
+    """Armazena o manifesto no diretório (veja main)."""
+    with open(os.path.join(output, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def _make_csv(reports, output, num_classes, sep, inputs={}, manifest=None):
     """ Processa os arquivos e grava os resultados em um arquivo CSV.
 
     O arquivo lista, para cada aluno, identificação, atividades que foram
@@ -106,6 +280,11 @@ def _make_csv(reports, output, num_classes, sep):
     No caso de uma quantidade de aulas ser fornecida, o progresso é substituído
     pela quantidade de "faltas", ou seja, pelo percentual de atividades NÃO
     completadas multiplicado por esta quantidade.
+
+    Sendo fornecido um manifesto (dicionário), um arquivo só é processado
+    novamente se os arquivos de entrada (veja _signature) ou os estudantes da
+    turma mudaram desde a última execução, e só é gravado se o seu conteúdo
+    mudou. O manifesto é atualizado com as informações de cada arquivo.
     """
 
     def full_csv_header():
@@ -114,24 +293,24 @@ def _make_csv(reports, output, num_classes, sep):
                          if num_classes else 'Progresso (%)'])
 
     def grades_csv_header():
-        first_key = next(iter(reports['grades'].keys()))
-        return sep.join(f'"{key}"'
-                        for key in reports['grades'][first_key]['Grades'])
+        return sep.join(f'"{key}"' for key in grades.activities)
 
     def grades_csv(id):
-        return sep.join(f'{g.replace(".", ",")}'
-                        for g in reports['grades'].get(id, {}).get(
-                            'Grades', {}).values())
+        if id not in grades:
+            return ''
+        texts = (grades.format(id, activity) for activity in grades.activities)
+        return sep.join('0' if text == '-' else text.replace('.', ',')
+                        for text in texts)  # '-' como em moodle.grades.read
 
     def progress(id):
-        absent = reports.get('progress', {}).get(id, {}).get('Faltas', '?') == '?'
-
-        if absent == '?':
+        if (frequency := moodle.progress.frequency(
+                reports.get('progress', moodle.store.Store()), id)) is None:
             return '?'
 
+        absent = 100 - frequency
         if num_classes:
-            return (int(absent) * num_classes) // 100
-        return 100 - int(absent)  # percentual do progresso
+            return (absent * num_classes) // 100
+        return frequency  # percentual do progresso
 
     def students_by_group():
         groups = defaultdict(list)
@@ -144,30 +323,51 @@ def _make_csv(reports, output, num_classes, sep):
         student = sep.join([s_id, reports['participants'][s_id]['Name']])
         return sep.join([student, grades_csv(s_id), str(progress(s_id))])
 
+    grades = reports['grades']
     locale.setlocale(locale.LC_ALL, '')
 
+    params = [num_classes, sep]
     for group, s_ids in students_by_group().items():
         if not s_ids:  # múltiplos grupos são ignorados.
             continue
 
-        file = os.path.join(output,
-                            f'{group.replace("/", "-").replace(" ", "_")}.csv')
-        print(f'writing {file}')
-        with open(file, 'w') as f:
-            f.write(f'{full_csv_header()}\n')
-            f.write('\n'.join(student_csv(id)
-                              for id in sorted(s_ids,
-                              key=lambda k: locale.strxfrm(
-                                reports['participants'][k]['Name']))))
+        name = f'{group.replace("/", "-").replace(" ", "_")}.csv'
+        file = os.path.join(output, name)
+        entry = manifest.get(name, {}) if manifest is not None else {}
+        if (os.path.isfile(file) and entry.get('inputs') == inputs and
+                entry.get('params') == params and
+                entry.get('students') == sorted(s_ids)):
+            print(f'{file} unchanged')
+            continue
+
+        content = '\n'.join([full_csv_header()] +
+                            [student_csv(id)
+                             for id in sorted(s_ids,
+                             key=lambda k: locale.strxfrm(
+                                reports['participants'][k]['Name']))])
+        digest = _digest(content)
+        if os.path.isfile(file) and entry.get('digest') == digest:
+            print(f'{file} unchanged')
+        else:
+            print(f'writing {file}')
+            with open(file, 'w') as f:
+                f.write(content)
+
+        if manifest is not None:
+            manifest[name] = {'inputs': inputs, 'params': params,
+                              'students': sorted(s_ids), 'digest': digest}
 
 
 def _parse_args():
     """Retorna os argumentos da linha de comando, devidamente processados."""
 
     parser = ArgumentParser()
-    parser.add_argument('files', nargs='+',
+    parser.add_argument('files', nargs='*',
                         help='Arquivos a serem processados no formato '
                              'CURSO.AAAA-P.ORIGEM.RELATORIO.EXTRA.EXT')
+    parser.add_argument('-l', '--list_readers', action='store_true',
+                        help='listar os métodos de leitura registrados e '
+                             'sair')
 
     parser.add_argument('-o', '--output', default='.',
                         help='diretório para armazenar os arquivos')
@@ -175,6 +375,23 @@ def _parse_args():
                         help='separador de elementos para arquivo')
     parser.add_argument('-a', '--aulas', type=int, default=0,
                         help='quantidade de aulas do semestre')
+    parser.add_argument('--min_presence', type=float,
+                        default=teams.attendance.MIN_PRESENCE,
+                        help='fração mínima (entre 0 e 1) da duração da '
+                             'reunião para contar presença')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='quantidade de processos para leitura dos '
+                             'arquivos')
+    parser.add_argument('--no_cache', dest='cache', action='store_false',
+                        help='não usar o cache de relatórios')
+    parser.add_argument('--cache_dir', default=cache.DEFAULT_DIR,
+                        help='diretório do cache de relatórios')
+    parser.add_argument('--cache_size', type=int,
+                        default=cache.DEFAULT_MAX_SIZE,
+                        help='tamanho máximo do cache de relatórios (em MB)')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='refazer todos os arquivos, ignorando o '
+                             'manifesto da execução anterior')
 
     # MOSS
     parser.add_argument('-m', '--moss', action='store_true',
@@ -184,24 +401,112 @@ def _parse_args():
     parser.add_argument('-i', '--ignore', nargs='+', default=[],
                         help='índices de questões em questionários que '
                              'devem ser ignoradas (MOSS)')
-    parser.add_argument('-t', '--threshold', default=30,
+    parser.add_argument('-t', '--threshold', type=int, default=30,
                         help='limiar de similaridade percentual (MOSS)')
+    parser.add_argument('--moss_jobs', type=int, default=4,
+                        help='quantidade máxima de questões submetidas '
+                             'simultaneamente (MOSS)')
+    parser.add_argument('-z', '--zip', action='store_true',
+                        help='gravar as respostas de cada questão em um '
+                             'único arquivo zip (MOSS)')
+    parser.add_argument('-L', '--local', action='store_true',
+                        help='avaliar a similaridade localmente, sem o '
+                             'MOSS (veja o módulo winnowing)')
+    parser.add_argument('--no_history', dest='history', action='store_false',
+                        help='não usar o histórico de respostas de outros '
+                             'períodos (MOSS)')
+    parser.add_argument('--history_dir', default=history.DEFAULT_DIR,
+                        help='diretório do histórico de respostas (veja o '
+                             'módulo history)')
+
+    args = parser.parse_args()
+    if not args.files and not args.list_readers:
+        parser.error('the following arguments are required: files')
+    return args
+
+
+def _run_MOSS(reports, output, ext, ignore, threshold, inputs={},
+              manifest=None, local=False, history_info=None, moss_jobs=4,
+              archive=False):
+    """Processa os arquivos para chamar o script MOSS.
+
+    As questões são submetidas ao MOSS concorrentemente (até moss_jobs
+    simultâneas, veja moss.run).
+
+    Se archive, as respostas de cada questão são gravadas em um único arquivo
+    zip (veja moodle.quiz.responses.write), extraído temporariamente apenas
+    para a submissão ao MOSS.
+
+    Se local, a similaridade é avaliada pelo módulo winnowing em vez do MOSS,
+    gerando um relatório no mesmo formato.
+
+    Sendo fornecida a tupla history_info (diretório do histórico, disciplina,
+    período), as respostas de cada questão são comparadas com as de outros
+    períodos e acrescentadas ao histórico (veja o módulo history).
+
+    Sendo fornecido um manifesto (dicionário), as respostas só são gravadas
+    novamente se os arquivos de entrada (veja _signature) mudaram desde a
+    última execução, e o MOSS só é chamado para as questões cujas respostas
+    mudaram. O manifesto é atualizado com as informações de cada questão,
+    inclusive as que não obtiveram relatório (report None), que são
+    submetidas novamente na próxima execução.
+    """
+    def quiz_question(path):
+        basename, question = os.path.split(path)
+        question, _ = os.path.splitext(question)  # Qn ou Qn.zip
+        return os.path.basename(basename), question
 
-    return parser.parse_args()
+    def report_file(path):
+        quiz, question = quiz_question(path)
+        return os.path.join(output, f'moss.quiz.{quiz}.{question}.html')
 
+    def call_moss(paths):
+        from contextlib import ExitStack
+        import tempfile
 
-def _run_MOSS(reports, output, ext, ignore, threshold):
-    """Processa os arquivos para chamar o script MOSS."""
-    def call_moss(path):
         shell_options = ['-x', '-l python' if ext == 'py' else '']
-        print(f'Calling MOSS... ({path})')
-        return moss.call(shell_options, path, ext)
-
-    def report(path, url):
-        basename, question = os.path.split(path)
-        basename, quiz = os.path.split(basename)
-        moss_report = os.path.join(output, f'moss.quiz.{quiz}.{question}.html')
-        return moss_report if moss.get_report(url, moss_report) else ''
+        with ExitStack() as stack:
+            directories = {}  # {diretório submetido: questão}
+            for path in paths:
+                print(f'Calling MOSS... ({path})')
+                if os.path.isfile(path):  # Arquivo zip.
+                    tmp_dir = stack.enter_context(
+                        tempfile.TemporaryDirectory())
+                    moodle.quiz.responses.extract(path, output_path=tmp_dir)
+                    directories[tmp_dir] = path
+                else:
+                    directories[path] = path
+
+            moss_reports = {}
+            for directory, url, moss_report in moss.run(
+                    [(directory, report_file(path))
+                     for directory, path in directories.items()],
+                    shell_options, ext, moss_jobs):
+                path = directories[directory]
+                print(url or f'Unable to get URL from MOSS... ({path})')
+                moss_reports[path] = moss_report
+        return moss_reports
+
+    def local_report(path):
+        moss_report = report_file(path)
+        return moss_report if winnowing.report(path, moss_report, ext) else ''
+
+    def responses_digest(path):
+        sources = winnowing.read_sources(path, ext)
+        contents = []
+        for file, code in sources.items():
+            contents.extend([file.encode(), code.encode()])
+        students = [file[:-len(ext) - 1] for file in sources
+                    if file != f'CORRECT.{ext}']
+        return _digest(*contents), students
+
+    def has_report(entry):
+        return bool(entry.get('report')) and os.path.isfile(
+            os.path.join(output, entry['report']))
+
+    def unchanged(entry):
+        return (entry.get('inputs') == inputs and
+                entry.get('params') == params and has_report(entry))
 
     def print_similar_groups(moss_report, path):
         """Agrupa estudantes com similaridade maior ou igual ao limiar
@@ -209,14 +514,14 @@ def _run_MOSS(reports, output, ext, ignore, threshold):
         disponíveis.
         """
         def get_info(student_id):
-            file = os.path.join(path, f'{student_id}.{ext}')
-            with open(file, 'r') as f:
-                name = next(f).strip()
-                next(f)  # student_id
-                group = next(f).strip()
-                grade = next(f).strip()
+            if student_id == 'CORRECT':  # resposta correta, sem cabeçalho.
+                return (student_id,)
+
+            lines = sources[f'{student_id}.{ext}'].split('\n', 4)
+            name, _, group, grade = (line.strip() for line in lines[:4])
             return name, group, grade
 
+        sources = winnowing.read_sources(path, ext)
         groups = [[get_info(student_id) for student_id in sorted(group)]
                   for group in moss.similar(moss_report, threshold)]
         for i, group in enumerate(groups):
@@ -224,13 +529,26 @@ def _run_MOSS(reports, output, ext, ignore, threshold):
                     for students in sorted(group)]
             print('\n\t'.join([f'Grupo {i + 1}):'] + info))
 
+    def check_history(path):
+        root, course, period = history_info
+        quiz, question = quiz_question(path)
+        prints = history.fingerprints(path, ext)
+        info = {'ext': ext, 'k': winnowing.K, 'window': winnowing.WINDOW}
+        for s_id, p1, other_period, other, p2 in history.search(
+                prints, course, quiz, question[1:], [period], root, info,
+                threshold=threshold):
+            print(f'{path}: {s_id} ({p1}%) ~ {other_period}/{other} ({p2}%)')
+        history.add(prints, course, period, quiz, question[1:], root, info)
+
     def write_quiz_responses(reports):
         def extra(student_id):
             def grade(student_id, quiz, question):
-                if (grade := quiz_grades.get(student_id, {}).get(quiz, {}).get(
-                        question, '?')) != '?':
-                    grade = f'{100 * float(grade):.2f}%'
-                return grade
+                if (grade := quiz_grades.get(student_id,
+                                             (quiz, question))) is None:
+                    return '?'
+                if math.isnan(grade):  # sem nota ('-')
+                    grade = 0
+                return f'{100 * grade:.2f}%'
 
             group = participants.get(student_id, {}).get('Group', 'Turma ?')
             return {key: {q: [group, grade(student_id, key, q)]
@@ -244,15 +562,53 @@ def _run_MOSS(reports, output, ext, ignore, threshold):
         header_extra = {student_id: extra(student_id)
                         for student_id in quiz_responses}
         return moodle.quiz.responses.write(quiz_responses, output, ext,
-                                           ignore, header_extra)
-
-    for path in write_quiz_responses(reports):
-        if url := call_moss(path):
-            print(url)
-            if moss_report := report(path, url):
-                print_similar_groups(moss_report, path)
+                                           ignore, header_extra,
+                                           skip_unchanged=True,
+                                           archive=archive)
+
+    params, entries = [ext, sorted(ignore), local, archive], {}
+    if manifest is not None:
+        entries = dict(manifest)
+    if entries and all(unchanged(entry) for entry in entries.values()):
+        paths = [os.path.join(output, key) for key in sorted(entries)]
+    else:
+        paths = write_quiz_responses(reports)
+        if manifest is not None:
+            manifest.clear()
+
+    # {diretório: relatório} e {diretório: (digest, estudantes)}
+    moss_reports, digests = {}, {}
+    for path in paths:
+        key = os.path.relpath(path, output)
+        if history_info is not None:
+            check_history(path)
+
+        entry = entries.get(key, {})
+        if unchanged(entry):
+            digests[path] = entry['digest'], entry['students']
         else:
-            print('Unable to get URL from MOSS...')
+            digests[path] = responses_digest(path)
+
+        if entry.get('digest') == digests[path][0] and has_report(entry):
+            print(f'{path} unchanged')
+            moss_reports[path] = os.path.join(output, entry['report'])
+        elif local:
+            print(f'Comparing files... ({path})')
+            moss_reports[path] = local_report(path)
+
+    if pending := [path for path in paths if path not in moss_reports]:
+        moss_reports.update(call_moss(pending))
+
+    for path in paths:
+        key = os.path.relpath(path, output)
+        digest, students = digests[path]
+        if moss_report := moss_reports[path]:
+            print_similar_groups(moss_report, path)
+        if manifest is not None:  # Sem relatório: nova tentativa depois.
+            manifest[key] = {'inputs': inputs, 'params': params,
+                             'students': students, 'digest': digest,
+                             'report': moss_report and os.path.relpath(
+                                 moss_report, output) or None}
 
 
 def main():
@@ -262,22 +618,58 @@ def main():
     planilha por turma com as notas e o progresso das atividades.
 
     Caso especificado, processa o MOSS para os questionários envolvidos.
+
+    Em cada diretório de saída, um manifesto (MANIFEST) registra os arquivos
+    de entrada e os estudantes de cada planilha e de cada questão submetida ao
+    MOSS, de modo que uma nova execução só refaz o que foi modificado.
     """
     args = _parse_args()
-    data = _load(args.files)
+    if args.list_readers:
+        for (source, report), (reader, _) in sorted(READERS.items()):
+            print(f'{source}.{report}: '
+                  f'{reader.__module__}.{reader.__qualname__}')
+        return
+
+    matches = _match(args.files)
+    data = _load(args.files, args.jobs,
+                 args.cache_dir if args.cache else None, args.cache_size,
+                 args.min_presence, matches)
+
+    sources = defaultdict(lambda: defaultdict(list))
+    for full_path, _, info in matches:
+        course, period, _, report, _, _ = info
+        sources[course, period][report].append(full_path)
+
+    def inputs(course, period, reports):
+        return _signature(file for report in reports
+                          for file in sources[course, period][report])
+
     for course, periods in data.items():
         for period, reports in periods.items():
             output = os.path.join(args.output, course, period)
             os.makedirs(output, exist_ok=True)
+            manifest = {} if args.force else _read_manifest(output)
 
             try:
-                _make_csv(reports, output, args.aulas, args.sep)
+                _make_csv(reports, output, args.aulas, args.sep,
+                          inputs(course, period,
+                                 ['grades', 'participants', 'progress']),
+                          manifest.setdefault('csv', {}))
             except Exception:
                 print('Error while making CSV report, skipping...')
 
             if args.moss:
                 _run_MOSS(reports, output, args.ext, args.ignore,
-                          args.threshold)
+                          args.threshold,
+                          inputs(course, period, ['participants',
+                                                  'quiz.grades',
+                                                  'quiz.responses']),
+                          manifest.setdefault('moss', {}), args.local,
+                          (args.history_dir, course, period)
+                          if args.history else None, args.moss_jobs,
+                          args.zip)
+
+            _write_manifest(output, manifest)
 
 
 if __name__ == '__main__':
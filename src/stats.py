@@ -0,0 +1,175 @@
+"""Estatísticas de questionários do Moodle por questão e turma.
+
+Para cada questão de cada questionário, calcula média, mediana, percentis,
+taxa de aprovação e discriminação (correlação entre a nota na questão e a
+nota nas demais questões do questionário), para cada turma e para o total.
+
+Os arquivos seguem o formato de nomes de process.py, sendo necessários os
+relatórios quiz.grades (notas normalizadas entre 0 e 1) e, para separar as
+turmas, participants.
+
+Para detalhes de uso, use a opção -h na linha de comando.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from operator import itemgetter, mul, sub
+import math
+import os
+
+import cache
+import process
+
+
+ALL = 'Total'
+HEADER = ['Questionário', 'Questão', 'Turma', 'N', 'Média', 'Mediana',
+          'P25', 'P75', 'P90', 'Aprovação (%)', 'Discriminação']
+PERCENTILES = (25, 75, 90)
+
+
+def _percentile(values, p):
+    """Retorna o percentil p (interpolado) da lista ordenada de valores."""
+    k = (len(values) - 1) * p / 100
+    i = int(k)
+    if i + 1 < len(values):
+        return values[i] + (values[i + 1] - values[i]) * (k - i)
+    return values[i]
+
+
+def _correlation(x, y):
+    """Retorna a correlação de Pearson entre as listas x e y (ou NaN)."""
+    n = len(x)
+    if n < 2:
+        return math.nan
+    sum_x, sum_y = sum(x), sum(y)
+    sxy = sum(map(mul, x, y)) - sum_x * sum_y / n
+    sxx = sum(map(mul, x, x)) - sum_x * sum_x / n
+    syy = sum(map(mul, y, y)) - sum_y * sum_y / n
+    if sxx <= 1e-12 or syy <= 1e-12:
+        return math.nan
+    return sxy / math.sqrt(sxx * syy)
+
+
+def compute(grades, groups={}, pass_grade=0.5):
+    """Calcula as estatísticas de cada questão, por turma.
+
+    Retorna uma lista de listas com os valores de cada linha (veja HEADER),
+    ordenada por questionário, questão e turma.
+
+    Notas ausentes ('-') contam como 0, mas apenas discentes que têm alguma
+    nota no questionário são considerados.
+
+    Argumentos:
+    grades -- matriz (moodle.store) com as notas dos questionários, cujas
+              atividades são tuplas (questionário, questão).
+    groups -- dicionário {matrícula: turma}.
+              (default {})
+    pass_grade -- nota mínima (normalizada) para aprovação na questão.
+                  (default 0.5)
+    """
+    quizzes = defaultdict(list)  # {questionário: [(questão, coluna)]}
+    for (quiz, question), col in grades.activities.items():
+        quizzes[quiz].append((question, col))
+
+    students = list(grades.students.items())
+    stats = []
+    for quiz, questions in quizzes.items():
+        columns = [grades.columns[col] for _, col in questions]
+
+        # Linhas dos discentes que fizeram o questionário, por turma.
+        rows = defaultdict(list)
+        for s_id, row in students:
+            if any(not math.isnan(column[row]) for column in columns):
+                rows[ALL].append(row)
+                rows[groups.get(s_id, '?')].append(row)
+
+        # Matriz (questão x discente) com ausentes como 0, e total por
+        # discente, para todas as turmas de uma vez.
+        scores = [[0.0 if math.isnan(v) else v for v in column]
+                  for column in columns]
+        totals = [sum(values) for values in zip(*scores)]
+        getters = {group: itemgetter(*group_rows)
+                   for group, group_rows in rows.items()
+                   if len(group_rows) > 1}
+
+        for (question, _), values in zip(questions, scores):
+            for group, group_rows in sorted(rows.items()):
+                if group in getters:
+                    item = list(getters[group](values))
+                    rest = list(map(sub, getters[group](totals), item))
+                else:
+                    item = [values[group_rows[0]]]
+                    rest = [totals[group_rows[0]] - item[0]]
+                ordered = sorted(item)
+                n = len(item)
+                passed = n - bisect_left(ordered, pass_grade)
+                stats.append([quiz, question, group, n, sum(item) / n,
+                              _percentile(ordered, 50)] +
+                             [_percentile(ordered, p) for p in PERCENTILES] +
+                             [100 * passed / n, _correlation(item, rest)])
+
+    def question_key(question):
+        return (0, int(question)) if question.isdigit() else (1, question)
+
+    return sorted(stats, key=lambda s: (s[0], question_key(s[1]),
+                                        s[2] != ALL, s[2]))
+
+
+def write(stats, file, sep=';'):
+    """Grava as estatísticas (veja compute) em um arquivo CSV."""
+    def fmt(value):
+        if isinstance(value, float):
+            return '' if math.isnan(value) else f'{value:.3f}'.replace('.',
+                                                                       ',')
+        return str(value)
+
+    print(f'writing {file}')
+    with open(file, 'w') as f:
+        f.write(sep.join(HEADER))
+        for row in stats:
+            f.write('\n' + sep.join(fmt(value) for value in row))
+
+
+def main():
+    """Processa argumentos da linha de comando.
+
+    Para cada disciplina/período, grava as estatísticas dos questionários em
+    um arquivo stats.csv.
+    """
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='+',
+                        help='Arquivos a serem processados no formato '
+                             'CURSO.AAAA-P.ORIGEM.RELATORIO.EXTRA.EXT')
+    parser.add_argument('-o', '--output', default='.',
+                        help='diretório para armazenar os arquivos')
+    parser.add_argument('-s', '--sep', default=';',
+                        help='separador de elementos para arquivo')
+    parser.add_argument('-p', '--pass_grade', type=float, default=0.5,
+                        help='nota mínima (entre 0 e 1) para aprovação na '
+                             'questão')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='quantidade de processos para leitura dos '
+                             'arquivos')
+    parser.add_argument('--no_cache', dest='cache', action='store_false',
+                        help='não usar o cache de relatórios')
+
+    args = parser.parse_args()
+    data = process._load(args.files, args.jobs,
+                         cache.DEFAULT_DIR if args.cache else None)
+    for course, periods in data.items():
+        for period, reports in periods.items():
+            if 'quiz.grades' not in reports:
+                continue
+
+            output = os.path.join(args.output, course, period)
+            os.makedirs(output, exist_ok=True)
+            groups = {s_id: info['Group'] for s_id, info in
+                      reports.get('participants', {}).items()}
+            write(compute(reports['quiz.grades'], groups, args.pass_grade),
+                  os.path.join(output, 'stats.csv'), args.sep)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,235 @@ Para obter o arquivo:
     1. Acesse a plataforma Teams.
     2. Acesse o calendário disponibilizado e abra os detalhes da reunião.
     3. Na aba "Chat", baixe o arquivo CSV.
+
+O arquivo tem uma seção de cabeçalho com o resumo da reunião (incluindo os
+horários de início e fim), seguida da lista de participantes com os horários
+de entrada e saída e a duração da participação, de modo que a presença pode
+ser ponderada pelo tempo na reunião (veja load e Summary).
+
+A codificação (UTF-8 ou UTF-16, com ou sem BOM) e o separador (tabulação,
+vírgula ou ponto e vírgula) variam conforme a versão do Teams, e são
+detectados a partir do início do arquivo (veja _sniff).
 """
+
+from array import array
+import codecs
 import csv
+from datetime import datetime
+import io
+import mmap
+import re
+
+
+MIN_PRESENCE = 0.0  # Fração mínima da reunião para contar presença.
+DURATION_PATTERN = re.compile(r'(?:(\d+)\s*h)?\s*(?:(\d+)\s*m(?:in)?)?\s*'
+                              r'(?:(\d+)\s*s)?')
+TIME_FORMATS = ('%m/%d/%Y, %I:%M:%S %p', '%m/%d/%y, %I:%M:%S %p',
+                '%d/%m/%Y, %H:%M:%S', '%d/%m/%Y %H:%M:%S',
+                '%Y-%m-%d %H:%M:%S')
+HEADERS = {  # informação: nomes possíveis da coluna ou do campo do resumo
+    'name': ('Full Name', 'Name'),
+    'join': ('Join Time', 'First Join'),
+    'leave': ('Leave Time', 'Last Leave'),
+    'duration': ('Duration', 'In-Meeting Duration'),
+    'email': ('Email',),
+    'start': ('Meeting Start Time', 'Start time'),
+    'end': ('Meeting End Time', 'End time')}
+BOMS = ((codecs.BOM_UTF8, 'utf-8'),  # BOM: codificação do restante
+        (codecs.BOM_UTF16_LE, 'utf-16-le'),
+        (codecs.BOM_UTF16_BE, 'utf-16-be'))
+DELIMITERS = '\t,;'
+SNIFF_SIZE = 4096  # Bytes do início do arquivo usados na detecção.
+SECTION_PATTERN = re.compile(r'\d+\.\s')  # Ex: '3. In-Meeting Activities'.
+
+
+def _seconds(text):
+    """Retorna a duração (ex: '1h 2m 3s' ou '1:02:03') em segundos, ou None
+    se não for possível interpretá-la.
+    """
+    text = text.strip()
+    if ':' in text:
+        try:
+            parts = [int(part) for part in text.split(':')]
+        except ValueError:
+            return None
+        return sum(part * 60**i for i, part in enumerate(reversed(parts)))
+    if text and (m := DURATION_PATTERN.fullmatch(text)):
+        h, m, s = (int(value or 0) for value in m.groups())
+        return 3600 * h + 60 * m + s
+    return None
+
+
+def _timestamp(text):
+    """Retorna o horário (datetime) do texto, ou None se não for possível
+    interpretá-lo (veja TIME_FORMATS).
+    """
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), time_format)
+        except ValueError:
+            pass
+    return None
+
+
+def _sniff(sample):
+    """Retorna a tupla (tamanho do BOM, codificação, separador) detectada a
+    partir dos bytes iniciais do arquivo.
+
+    Sem BOM, arquivos UTF-16 são identificados pelos bytes nulos (nas
+    posições pares para big-endian, ímpares para little-endian), e os demais
+    são considerados UTF-8 (ou cp1252, se não forem UTF-8 válidos). O
+    separador é o mais frequente (fora de aspas) nas linhas iniciais.
+    """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            skip = len(bom)
+            break
+    else:
+        skip, encoding = 0, 'utf-8'
+        if sample[1::2].count(0) > len(sample) // 4:
+            encoding = 'utf-16-le'
+        elif sample[::2].count(0) > len(sample) // 4:
+            encoding = 'utf-16-be'
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    try:
+        text = decoder.decode(sample[skip:])
+    except UnicodeDecodeError:
+        encoding = 'cp1252'
+        text = sample[skip:].decode(encoding, 'replace')
+
+    text = re.sub(r'"[^"]*"', '', text)
+    delimiter = max(DELIMITERS, key=text.count)
+    return skip, encoding, delimiter
+
+
+def _decode(data, encoding, skip=0):
+    """Retorna o texto dos bytes na codificação detectada (veja _sniff).
+
+    Como a detecção usa apenas o início do arquivo, se um arquivo sem BOM
+    considerado UTF-8 não for UTF-8 válido (ex: caractere acentuado em
+    cp1252 após SNIFF_SIZE bytes), é decodificado como cp1252.
+    """
+    try:
+        return codecs.decode(data, encoding)
+    except UnicodeDecodeError:
+        if encoding == 'utf-8' and not skip:
+            encoding = 'cp1252'
+        return codecs.decode(data, encoding, 'replace')
+
+
+def _rows(file, meeting=None):
+    """Itera pelos participantes do arquivo, gerando tuplas (matrícula, nome,
+    entrada, saída, duração), com os textos das respectivas colunas (ou None,
+    se a coluna não existir).
+
+    O arquivo é mapeado em memória (mmap) e decodificado de uma só vez (o
+    texto decodificado é copiado uma vez pelo io.StringIO lido pelo csv), e
+    lido em uma única passagem. O resumo da reunião (seção de cabeçalho) é
+    armazenado no dicionário meeting (se fornecido), no formato {campo:
+    valor}, antes de gerar os participantes, que terminam na primeira linha
+    em branco ou no título de outra seção (veja SECTION_PATTERN). Outras
+    linhas incompletas (ex: convidado sem email) são ignoradas.
+
+    Argumentos:
+    file -- o arquivo CSV a ser lido.
+    meeting -- dicionário a ser atualizado com o resumo da reunião.
+               (default None)
+    """
+    def column(header, key, default=None):
+        for name in HEADERS[key]:
+            if name in header:
+                return header.index(name)
+        return default
+
+    meeting = {} if meeting is None else meeting
+    with open(file, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                skip, encoding, delimiter = _sniff(mm[:SNIFF_SIZE])
+                with memoryview(mm) as view:
+                    text = _decode(view[skip:], encoding, skip)
+        except ValueError:  # Arquivo vazio.
+            return
+
+    csvreader = csv.reader(io.StringIO(text, newline=''),
+                           delimiter=delimiter)
+    for row in csvreader:
+        if row[:1] and row[0].strip() in HEADERS['name']:
+            header = [name.strip() for name in row]
+            break
+        if len(row) > 1:
+            meeting[row[0].strip()] = row[1]
+    else:
+        return
+
+    name, email = column(header, 'name'), column(header, 'email', 4)
+    join, leave = column(header, 'join'), column(header, 'leave')
+    duration = column(header, 'duration')
+    last = max(i for i in (name, email, join, leave, duration)
+               if i is not None)
+    for row in csvreader:
+        if not ''.join(row).strip() or SECTION_PATTERN.match(row[0]):
+            break
+        if len(row) <= last:
+            continue
+        yield (row[email].split('@')[0], row[name],
+               None if join is None else row[join],
+               None if leave is None else row[leave],
+               None if duration is None else row[duration])
+
+
+def load(file, info=None):
+    """Lê os dados do arquivo e os retorna como um dicionário, no formato
+    {matrícula: {'Name': nome, 'Duration': segundos, 'Presence': fração}}.
+
+    A duração soma as participações do discente (se houver mais de uma) e a
+    presença é a fração da duração da reunião (limitada a 1), ou None se não
+    for possível determiná-la.
+
+    A duração da reunião é obtida dos horários de início e fim do resumo ou,
+    na sua ausência, da primeira entrada e da última saída dos participantes.
+    Os horários dos participantes só são interpretados quando necessário, já
+    que isso domina o tempo de leitura.
+
+    Argumentos:
+    file -- o arquivo CSV a ser lido.
+    info -- string descrevendo o arquivo.
+    """
+    def summary_time(key):
+        for name in HEADERS[key]:
+            if name in meeting:
+                return _timestamp(meeting[name])
+
+    def interval(join, leave):
+        return _timestamp(join or ''), _timestamp(leave or '')
+
+    meeting, attendance, intervals = {}, {}, []
+    for s_id, name, join, leave, duration in _rows(file, meeting):
+        seconds = _seconds(duration or '')
+        if seconds is None and all(times := interval(join, leave)):
+            seconds = int((times[1] - times[0]).total_seconds())
+        if s_id not in attendance:
+            attendance[s_id] = {'Name': name, 'Duration': seconds}
+        elif seconds is not None:
+            attendance[s_id]['Duration'] = (
+                attendance[s_id]['Duration'] or 0) + seconds
+        intervals.append((join, leave))
+
+    start, end = summary_time('start'), summary_time('end')
+    if not (start and end):
+        times = [interval(*texts) for texts in intervals]
+        joins = [join for join, _ in times if join]
+        leaves = [leave for _, leave in times if leave]
+        start = start or (min(joins) if joins else None)
+        end = end or (max(leaves) if leaves else None)
+    length = (end - start).total_seconds() if start and end else None
+    for student in attendance.values():
+        student['Presence'] = None
+        if length and student['Duration'] is not None:
+            student['Presence'] = min(1.0, student['Duration'] / length)
+    return attendance
 
 
 def read(file, info):
@@ -15,21 +242,60 @@ def read(file, info):
     file -- o arquivo CSV a ser lido.
     info -- string descrevendo o arquivo.
     """
-    attendance = {}
+    return {s_id: {'Name': name} for s_id, name, *_ in _rows(file)}
 
-    # with open(file, encoding='utf-16') as csvfile:
-    with open(file, encoding='utf-16-le') as csvfile:
-        csvreader = csv.reader(csvfile, delimiter='\t')
-        try:
-            while ['Full Name'] != next(csvreader)[:1]:
-                pass
-            for row in csvreader:
-                name, s_id = row[0], row[4].split('@')[0]
-                attendance[s_id] = {'Name': name}
-        except StopIteration:
-            pass
 
-    return attendance
+class Summary:
+    """Presença acumulada dos discentes em várias reuniões.
+
+    Mantém, por discente (linha), contadores compactos (array) com a
+    quantidade de reuniões com presença e a soma das frações de presença,
+    em vez de dicionários aninhados.
+
+    Atributos:
+    students -- dicionário {matrícula: linha}.
+    names -- lista com o nome de cada discente (por linha).
+    attended -- quantidade de reuniões com presença de cada discente.
+    presence -- soma das frações de presença de cada discente.
+    meetings -- quantidade de reuniões acrescentadas.
+    min_presence -- fração mínima da reunião para contar presença.
+    """
+
+    def __init__(self, min_presence=MIN_PRESENCE):
+        self.students, self.names = {}, []
+        self.attended, self.presence = array('I'), array('d')
+        self.meetings, self.min_presence = 0, min_presence
+
+    def add(self, attendance):
+        """Acrescenta uma reunião (veja load).
+
+        Discentes sem fração de presença (None ou ausente) têm presença
+        integral.
+        """
+        self.meetings += 1
+        for s_id, info in attendance.items():
+            if (row := self.students.get(s_id)) is None:
+                row = self.students[s_id] = len(self.names)
+                self.names.append(info['Name'])
+                self.attended.append(0)
+                self.presence.append(0.0)
+
+            if (presence := info.get('Presence')) is None:
+                presence = 1.0
+            self.presence[row] += presence
+            if presence >= self.min_presence:
+                self.attended[row] += 1
+
+    def percentages(self):
+        """Retorna um dicionário {matrícula: {'Name': nome, 'Attendance':
+        percentual de reuniões com presença, 'Presence': percentual do tempo
+        total das reuniões}}.
+        """
+        meetings = max(self.meetings, 1)
+        return {s_id: {'Name': self.names[row],
+                       'Attendance': 100 * self.attended[row] // meetings,
+                       'Presence': round(100 * self.presence[row] / meetings)}
+                for s_id, row in self.students.items()}
 
 
 def main():
@@ -42,23 +308,22 @@ def main():
     parser.add_argument('files', nargs='+', help='Arquivos CSV a serem lidos.')
     parser.add_argument('-s', '--students_only', action='store_true',
                         help='Considerar apenas alunos.')
+    parser.add_argument('-m', '--min_presence', type=float,
+                        default=MIN_PRESENCE,
+                        help='Fração mínima (entre 0 e 1) da duração da '
+                             'reunião para contar presença.')
 
     args = parser.parse_args()
 
     locale.setlocale(locale.LC_ALL, '')
-    attendance, num_files = {}, 0
+    summary = Summary(args.min_presence)
     for file in args.files:
-        if att := read(file, None):
-            for s_id, info in att.items():
-                if not args.students_only or s_id.isdigit():
-                    if s_id not in attendance:
-                        attendance[s_id] = {'Name': info['Name'],
-                                            'Attendance': 0}
-                    attendance[s_id]['Attendance'] += 1
-            num_files += 1
-    for info in sorted(attendance.values(),
+        if attendance := load(file, None):
+            summary.add({s_id: info for s_id, info in attendance.items()
+                         if not args.students_only or s_id.isdigit()})
+    for info in sorted(summary.percentages().values(),
                        key=lambda x: locale.strxfrm(x['Name'])):
-        print(f'{info["Name"]},{100 * info["Attendance"] // num_files}%')
+        print(f'{info["Name"]},{info["Attendance"]}%,{info["Presence"]}%')
 
 
 if __name__ == '__main__':
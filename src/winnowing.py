@@ -0,0 +1,363 @@
+"""Avaliação local de similaridade de código (alternativa ao MOSS).
+
+Implementa o algoritmo de "winnowing" usado pelo MOSS (Schleimer, Wilkerson e
+Aiken, 2003): os arquivos são convertidos em sequências de tokens
+normalizados (identificadores, números e textos perdem seus valores e
+comentários são ignorados), dos quais são calculados os hashes de cada
+k-grama. De cada janela de hashes consecutivos é selecionado o menor, e o
+conjunto dos hashes selecionados é a "impressão digital" do arquivo.
+
+A similaridade entre dois arquivos é o percentual da impressão digital de
+cada um que é compartilhado com o outro. Os resultados seguem o formato do
+relatório do MOSS, de modo que podem ser usados por moss.similar.
+"""
+
+from collections import Counter, defaultdict
+from hashlib import blake2b
+from itertools import combinations
+import builtins
+import html
+import io
+import keyword
+import os
+import re
+import time
+import tokenize
+import zipfile
+
+
+K, WINDOW = 12, 8  # Tamanho do k-grama e da janela (em tokens).
+MAX_SHARE = 0.1  # Fração máxima de arquivos com o mesmo hash...
+MAX_COUNT = 10  # ...se for mais que esta quantidade (como o -m do MOSS).
+C_KEYWORDS = frozenset('auto break case char class const continue default '
+                       'delete do double else enum extern float for goto if '
+                       'include int long namespace new private protected '
+                       'public register return short signed sizeof static '
+                       'struct switch template this throw try typedef union '
+                       'unsigned using virtual void volatile while'.split())
+PY_NAMES = frozenset(keyword.kwlist + dir(builtins))
+TOKEN_PATTERNS = {
+    'py': re.compile(r'(?P<comment>#.*)|'
+                     r'(?P<string>"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|'
+                     r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')|'
+                     r'(?P<number>\d[\w.]*)|(?P<name>\w+)|(?P<op>\S)'),
+    'c': re.compile(r'(?P<comment>//.*|/\*[\s\S]*?\*/)|'
+                    r'(?P<string>"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')|'
+                    r'(?P<number>\d[\w.]*)|(?P<name>\w+)|(?P<op>\S)')}
+
+
+def _python_tokens(text):
+    """Retorna a lista de tuplas (token, linha) de um código Python."""
+    TYPES = {tokenize.NUMBER: 'N', tokenize.STRING: 'S',
+             tokenize.NEWLINE: ';', tokenize.INDENT: '{',
+             tokenize.DEDENT: '}'}
+
+    tokens = []
+    for token in tokenize.generate_tokens(io.StringIO(text).readline):
+        if token.type == tokenize.NAME:
+            name = token.string if token.string in PY_NAMES else 'V'
+            tokens.append((name, token.start[0]))
+        elif token.type == tokenize.OP:
+            tokens.append((token.string, token.start[0]))
+        elif token.type in TYPES:
+            tokens.append((TYPES[token.type], token.start[0]))
+    return tokens
+
+
+def tokens(text, ext='py'):
+    """Retorna a lista de tuplas (token, linha) do código, com os tokens
+    normalizados.
+
+    Argumentos:
+    text -- o código a ser processado.
+    ext -- extensão (linguagem) do código.
+           (default 'py')
+    """
+    if ext == 'py':
+        try:
+            return _python_tokens(text)
+        except (tokenize.TokenError, SyntaxError):
+            pass  # Código inválido, usa o processamento genérico.
+
+    names = PY_NAMES if ext == 'py' else C_KEYWORDS
+    tokens, line, last = [], 1, 0
+    for m in TOKEN_PATTERNS.get(ext, TOKEN_PATTERNS['c']).finditer(text):
+        line += text.count('\n', last, m.start())
+        last = m.start()
+        if m.lastgroup == 'name':
+            tokens.append((m.group() if m.group() in names else 'V', line))
+        elif m.lastgroup == 'number':
+            tokens.append(('N', line))
+        elif m.lastgroup == 'string':
+            tokens.append(('S', line))
+        elif m.lastgroup == 'op':
+            tokens.append((m.group(), line))
+    return tokens
+
+
+def fingerprints(tokens, k=K, window=WINDOW):
+    """Retorna um dicionário {hash: linha} com a impressão digital dos tokens
+    (veja tokens), onde linha é a primeira linha do k-grama selecionado.
+
+    Os hashes são inteiros de 64 bits, estáveis entre execuções.
+
+    Argumentos:
+    tokens -- lista de tuplas (token, linha).
+    k -- tamanho do k-grama.
+         (default K)
+    window -- tamanho da janela de hashes.
+              (default WINDOW)
+    """
+    hashes = [int.from_bytes(blake2b('\0'.join(
+                  token for token, _ in tokens[i:i + k]).encode(),
+                  digest_size=8).digest(), 'little')
+              for i in range(len(tokens) - k + 1)]
+
+    selected = {}
+    for i in range(max(len(hashes) - window + 1, 1 if hashes else 0)):
+        # Menor hash da janela (o mais à direita, em caso de empate).
+        current = hashes[i:i + window]
+        j = len(current) - 1 - current[::-1].index(min(current))
+        selected.setdefault(hashes[i + j], tokens[i + j][1])
+    return selected
+
+
+def read_sources(path, ext):
+    """Retorna um dicionário {arquivo: código} dos arquivos com a extensão
+    fornecida, de um diretório ou de um arquivo zip (como os gravados por
+    moodle.quiz.responses.write).
+    """
+    sources = {}
+    if os.path.isfile(path):
+        with zipfile.ZipFile(path) as zip_file:
+            for file in sorted(zip_file.namelist()):
+                if file.endswith(f'.{ext}'):
+                    sources[file] = zip_file.read(file).decode(
+                        errors='replace')
+        return sources
+
+    for file in sorted(os.listdir(path)):
+        if file.endswith(f'.{ext}'):
+            with open(os.path.join(path, file), errors='replace') as f:
+                sources[file] = f.read()
+    return sources
+
+
+def share_limit(count, max_share=MAX_SHARE):
+    """Retorna a quantidade máxima de arquivos com o mesmo hash para que
+    ele seja considerado, dentre count arquivos.
+
+    Apenas hashes comuns na coleção são descartados: o limite nunca é menor
+    que MAX_COUNT, bem acima do tamanho esperado de um grupo de arquivos
+    copiados uns dos outros, de modo que a fração max_share só se aplica a
+    coleções grandes.
+
+    Argumentos:
+    count -- quantidade de arquivos.
+    max_share -- fração máxima de arquivos com o mesmo hash.
+                 (default MAX_SHARE)
+    """
+    return max(MAX_COUNT, int(max_share * count))
+
+
+def index(prints, base=(), max_share=MAX_SHARE):
+    """Retorna o índice invertido {hash: [arquivos]} das impressões digitais.
+
+    Hashes dos arquivos base (ex: código fornecido ou resposta correta), ou
+    presentes em mais arquivos que o limite (veja share_limit), não são
+    considerados. Hashes presentes em um único arquivo também são
+    descartados.
+
+    Argumentos:
+    prints -- dicionário {arquivo: impressão digital} (veja fingerprints).
+    base -- arquivos cujo código é comum a todos.
+            (default ())
+    max_share -- fração máxima de arquivos com o mesmo hash (veja
+                 share_limit).
+                 (default MAX_SHARE)
+    """
+    suppressed = set()
+    for file in base:
+        suppressed.update(prints.get(file, ()))
+
+    postings = defaultdict(list)
+    for file, fp in prints.items():
+        if file not in base:
+            for h in fp.keys() - suppressed:
+                postings[h].append(file)
+
+    limit = share_limit(len(prints) - len(base), max_share)
+    return {h: files for h, files in postings.items()
+            if 1 < len(files) <= limit}
+
+
+def candidates(postings):
+    """Retorna um dicionário {(arquivo1, arquivo2): quantidade} com a
+    quantidade de hashes compartilhados por cada par de arquivos, a partir do
+    índice invertido (veja index).
+
+    Apenas pares com algum hash em comum são gerados, evitando comparar
+    todos os pares de arquivos.
+    """
+    pairs = Counter()
+    for files in postings.values():
+        pairs.update(combinations(files, 2))
+    return pairs
+
+
+def compare(sources, ext='py', k=K, window=WINDOW, base=(),
+            max_share=MAX_SHARE, threshold=0, verbose=False):
+    """Compara os códigos e retorna uma lista com as tuplas (arquivo1,
+    percentual1, arquivo2, percentual2, linhas) dos pares com alguma
+    similaridade, em ordem decrescente de similaridade.
+
+    O percentual de cada arquivo indica o quanto de sua impressão digital é
+    compartilhada com o outro, e linhas indica a quantidade de linhas do
+    primeiro arquivo onde há trechos similares (como no relatório do MOSS).
+
+    Os pares são obtidos de um índice invertido das impressões digitais (veja
+    index e candidates), e não pela comparação de todos os pares.
+
+    Argumentos:
+    sources -- dicionário {arquivo: código}.
+    ext -- extensão (linguagem) dos códigos.
+           (default 'py')
+    k -- tamanho do k-grama.
+         (default K)
+    window -- tamanho da janela de hashes.
+              (default WINDOW)
+    base -- arquivos cujo código é comum a todos (veja index).
+            (default ())
+    max_share -- fração máxima de arquivos com o mesmo hash (veja
+                 share_limit).
+                 (default MAX_SHARE)
+    threshold -- percentual mínimo de similaridade (em algum dos arquivos)
+                 para que o par seja incluído.
+                 (default 0)
+    verbose -- booleano indicando se apresenta o tempo de cada etapa e a
+               quantidade de pares avaliados.
+               (default False)
+    """
+    times = [time.perf_counter()]
+    prints = {file: fingerprints(tokens(code, ext), k, window)
+              for file, code in sources.items()}
+    times.append(time.perf_counter())
+    postings = index(prints, base, max_share)
+    times.append(time.perf_counter())
+    shared = candidates(postings)
+    times.append(time.perf_counter())
+
+    pairs = []
+    for (file1, file2), count in shared.items():
+        fp1, fp2 = prints[file1], prints[file2]
+        if 100 * count // min(len(fp1), len(fp2)) < threshold:
+            continue
+        lines = {fp1[h] for h in fp1.keys() & fp2.keys() if h in postings}
+        pairs.append((file1, 100 * count // len(fp1),
+                      file2, 100 * count // len(fp2), len(lines)))
+    times.append(time.perf_counter())
+
+    if verbose:
+        n = len(prints) - len(set(base) & prints.keys())
+        all_pairs = n * (n - 1) // 2
+        print(f'{n} arquivos, {len(postings)} hashes compartilhados, '
+              f'{len(shared)} de {all_pairs} pares avaliados '
+              f'({100 * (1 - len(shared) / max(all_pairs, 1)):.1f}% '
+              f'descartados)')
+        steps = ('impressões digitais', 'índice', 'pares candidatos',
+                 'similaridade')
+        print(', '.join(f'{step}: {end - start:.3f}s' for step, start, end
+                        in zip(steps, times, times[1:])))
+
+    return sorted(pairs, key=lambda p: (-max(p[1], p[3]), -p[4], p[0], p[2]))
+
+
+def write_report(pairs, out_file, title=''):
+    """Grava os resultados (veja compare) em um arquivo HTML no formato do
+    relatório do MOSS.
+
+    Argumentos:
+    pairs -- lista de tuplas (arquivo1, percentual1, arquivo2, percentual2,
+             linhas).
+    out_file -- nome do arquivo onde salvar o relatório.
+    title -- identificação dos arquivos avaliados.
+    """
+    rows = '\n'.join(f'<TR><TD><A HREF="#match{i}">{html.escape(f1)} '
+                     f'({p1}%)</A>\n    <TD><A HREF="#match{i}">'
+                     f'{html.escape(f2)} ({p2}%)</A>\n'
+                     f'<TD ALIGN=right>{lines}'
+                     for i, (f1, p1, f2, p2, lines) in enumerate(pairs))
+    with open(out_file, 'w', encoding='utf-8') as f:
+        f.write(f'<HTML>\n<HEAD>\n<TITLE>Moss Results</TITLE>\n</HEAD>\n'
+                f'<BODY>\nMoss Results - winnowing {html.escape(title)}<P>\n'
+                f'<TABLE>\n<TR><TH>File 1<TH>File 2<TH>Lines Matched\n'
+                f'{rows}\n</TABLE>\n</BODY>\n</HTML>\n')
+
+
+def report(path, out_file, ext='py', base=None):
+    """Compara os arquivos do diretório e grava o relatório (veja
+    write_report).
+
+    Retorna um booleano indicando se foi bem sucedido ou não.
+
+    Argumentos:
+    path -- diretório (ou arquivo zip) onde estão os arquivos para serem
+            analisados.
+    out_file -- nome do arquivo onde salvar o relatório.
+    ext -- extensão do tipo de arquivo a ser analisado.
+           (default 'py')
+    base -- arquivos cujo código é comum a todos (veja index).
+            (default resposta correta, CORRECT.ext)
+    """
+    if base is None:
+        base = [f'CORRECT.{ext}']
+    try:
+        write_report(compare(read_sources(path, ext), ext, base=base),
+                     out_file, path)
+    except (OSError, zipfile.BadZipFile) as e:
+        print(e)
+        return False
+    return True
+
+
+def main():
+    """Processa argumentos da linha de comando."""
+
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(__doc__.split('\n')[0])
+    parser.add_argument('path',
+                        help='Diretório (ou arquivo zip) onde estão os '
+                             'arquivos para serem analisados.')
+    parser.add_argument('-e', '--ext', default='py',
+                        help='Extensão do tipo de arquivo a ser analisado.')
+    parser.add_argument('-o', '--out_file',
+                        help='Arquivo onde salvar o relatório HTML.')
+    parser.add_argument('-t', '--threshold', type=int, default=30,
+                        help='Limiar de similaridade percentual.')
+    parser.add_argument('-b', '--base', nargs='*',
+                        help='Arquivos cujo código é comum a todos '
+                             '(default CORRECT.EXT).')
+    parser.add_argument('-m', '--max_share', type=float, default=MAX_SHARE,
+                        help='Fração máxima de arquivos com o mesmo trecho '
+                             'de código para que seja considerado (se mais '
+                             f'que {MAX_COUNT} arquivos).')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Apresentar tempos de execução e quantidade de '
+                             'pares avaliados.')
+
+    args = parser.parse_args()
+    if args.base is None:
+        args.base = [f'CORRECT.{args.ext}']
+    pairs = compare(read_sources(args.path, args.ext), args.ext,
+                    base=args.base, max_share=args.max_share,
+                    threshold=args.threshold, verbose=args.verbose)
+    if args.out_file:
+        write_report(pairs, args.out_file, args.path)
+    for file1, p1, file2, p2, lines in pairs:
+        if p1 >= args.threshold or p2 >= args.threshold:
+            print(f'{file1} ({p1}%), {file2} ({p2}%): {lines} linhas')
+
+
+if __name__ == '__main__':
+    main()
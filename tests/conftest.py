@@ -0,0 +1,7 @@
+"""Makes the modules in src (and src/coderunner) importable by the tests."""
+
+import os
+import sys
+
+SRC = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path[:0] = [SRC, os.path.join(SRC, 'coderunner')]
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+from teams import attendance
+
+
+DATA = os.path.join(os.path.dirname(__file__), 'data', 'teams')
+VARIANTS = ['utf8_tab', 'utf8_bom_tab', 'utf16le_tab', 'utf16le_bom_tab',
+            'utf16be_tab', 'utf16be_bom_tab', 'utf8_comma',
+            'utf8_bom_semicolon', 'cp1252_comma', 'sections_utf16le_bom',
+            'sections_utf8_bom', 'email_first_tab']
+ATTENDANCE = {'200000001': {'Name': 'Álvaro Ção', 'Duration': 4500,
+                            'Presence': 0.75},
+              'bob': {'Name': 'Bob', 'Duration': 6000, 'Presence': 1.0}}
+
+
+def path(variant):
+    return os.path.join(DATA, f'{variant}.csv')
+
+
+@pytest.mark.parametrize('variant', VARIANTS)
+def test_read(variant):
+    assert attendance.read(path(variant), variant) == {
+        s_id: {'Name': info['Name']} for s_id, info in ATTENDANCE.items()}
+
+
+@pytest.mark.parametrize('variant', VARIANTS)
+def test_load(variant):
+    assert attendance.load(path(variant), variant) == ATTENDANCE
+
+
+def test_empty():
+    assert attendance.read(path('empty'), 'empty') == {}
+    assert attendance.load(path('empty'), 'empty') == {}
+
+
+def test_cp1252_after_sniff_size():
+    file = path('cp1252_late_tab')
+    with open(file, 'rb') as f:
+        assert f.read().index('ã'.encode('cp1252')) > attendance.SNIFF_SIZE
+    assert attendance.read(file, '')['200000001'] == {'Name': 'João Ção'}
+    info = attendance.load(file, '')['200000001']
+    assert (info['Name'], info['Duration'], info['Presence']) == (
+        'João Ção', 4500, 0.75)
+    assert len(attendance.read(file, '')) == 61
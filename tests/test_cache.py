@@ -0,0 +1,17 @@
+import os
+import pickle
+
+import pytest
+
+import cache
+
+
+def test_put_and_get(tmp_path):
+    cache.put('k', {'a': 1}, str(tmp_path))
+    assert cache.get('k', str(tmp_path)) == (True, {'a': 1})
+
+
+def test_put_removes_temporary_file(tmp_path):
+    with pytest.raises((AttributeError, TypeError, pickle.PicklingError)):
+        cache.put('k', lambda: None, str(tmp_path))  # Não serializável.
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,48 @@
+import history
+import winnowing
+
+from test_winnowing import copy_group_sources
+
+
+def fingerprints(sources):
+    return {file[:-3]: sorted(winnowing.fingerprints(
+                winnowing.tokens(code)).keys())
+            for file, code in sources.items()}
+
+
+def test_copy_group_from_previous_period_is_found(tmp_path):
+    sources = copy_group_sources()
+    previous = fingerprints(sources)
+    assert history.add(previous, 'CIC0004', '2023-1', 'L1', '1', tmp_path)
+
+    current = {'190000001': previous['copy0']}
+    matches = history.search(current, 'CIC0004', 'L1', '1', ['2023-2'],
+                             tmp_path)
+    assert {(period, other) for _, _, period, other, _ in matches[:3]} == {
+        ('2023-1', f'copy{i}') for i in range(3)}
+    assert all(p1 == p2 >= 50 for _, p1, _, _, p2 in matches[:3])
+
+
+def test_current_period_is_excluded(tmp_path):
+    prints = fingerprints(copy_group_sources())
+    history.add(prints, 'CIC0004', '2023-1', 'L1', '1', tmp_path)
+    assert history.search({'190000001': prints['copy0']}, 'CIC0004', 'L1',
+                          '1', ['2023-1'], tmp_path) == []
+
+
+def test_search_lists_only_the_question(tmp_path, monkeypatch):
+    prints = fingerprints(copy_group_sources())
+    for course, period in (('CIC0004', '2022-2'), ('CIC0004', '2023-1'),
+                           ('CIC0007', '2023-1')):
+        history.add(prints, course, period, 'L1', '1', tmp_path)
+    history.add(prints, 'CIC0004', '2022-1', 'L2', '1', tmp_path)
+
+    def walk(*args):
+        raise AssertionError('os.walk over the whole history')
+
+    monkeypatch.setattr(history.os, 'walk', walk)
+    assert history.periods('CIC0004', 'L1', '1', tmp_path) == ['2022-2',
+                                                               '2023-1']
+    matches = history.search({'190000001': prints['copy0']}, 'CIC0004',
+                             'L1', '1', ['2023-1'], tmp_path)
+    assert {period for _, _, period, _, _ in matches} == {'2022-2'}
@@ -0,0 +1,130 @@
+"""Tests moss.run against a local stub HTTP server and a fake moss script
+(tests/bin/moss), without contacting the MOSS server.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+import time
+
+import pytest
+
+import moss
+
+
+REPORT = ('<HTML><BODY>Moss Results<P><TABLE>\n'
+          '<TR><TD><A HREF="match0.html">{name}/1.py (90%)</A>\n'
+          '    <TD><A HREF="match0.html">{name}/2.py (80%)</A>\n'
+          '<TD ALIGN=right>12\n</TABLE></BODY></HTML>\n')
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Serves a MOSS report for /<name>, failing (503) the first
+    server.fails requests.
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if len(self.server.requests) <= self.server.fails:
+            self.send_error(503)
+            return
+        body = REPORT.format(name=self.path.strip('/')).encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.requests, server.fails = [], 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_moss(tmp_path, server, monkeypatch):
+    """Puts the fake moss script in PATH and returns its log file."""
+    bin_dir = os.path.join(os.path.dirname(__file__), 'bin')
+    monkeypatch.setenv('PATH', f'{bin_dir}{os.pathsep}{os.environ["PATH"]}')
+    monkeypatch.setenv('MOSS_URL', f'http://127.0.0.1:{server.server_port}')
+    monkeypatch.setenv('MOSS_LOG', str(tmp_path / 'moss.log'))
+    return tmp_path / 'moss.log'
+
+
+def _tasks(tmp_path, count):
+    tasks = []
+    for i in range(count):
+        directory = tmp_path / f'Q{i}'
+        directory.mkdir()
+        (directory / '1.py').write_text('print(1)\n')
+        tasks.append((str(directory), str(tmp_path / f'Q{i}.html')))
+    return tasks
+
+
+def _calls(log):
+    return [line.split() for line in log.read_text().splitlines()]
+
+
+def test_reports_are_downloaded(tmp_path, fake_moss, server):
+    tasks = _tasks(tmp_path, 3)
+    results = sorted(moss.run(tasks, [], backoff=0))
+    assert [(path, url) for path, url, _ in results] == [
+        (path, f'{os.environ["MOSS_URL"]}/{os.path.basename(path)}')
+        for path, _ in tasks]
+    for (path, out_file), (_, _, report) in zip(tasks, results):
+        assert report == out_file
+        assert list(moss.pairs(report)) == [(f'Q{path[-1]}/1.py', 90,
+                                       f'Q{path[-1]}/2.py', 80, 12)]
+
+
+def test_submissions_run_in_parallel(tmp_path, fake_moss, monkeypatch):
+    monkeypatch.setenv('MOSS_DELAY', '0.5')
+    start = time.perf_counter()
+    results = list(moss.run(_tasks(tmp_path, 4), [], jobs=4, backoff=0))
+    assert all(report for _, _, report in results)
+    assert time.perf_counter() - start < 4 * 0.5
+
+    running, most = 0, 0
+    for event, _, _ in sorted(_calls(fake_moss), key=lambda c: float(c[2])):
+        running += 1 if event == 'start' else -1
+        most = max(most, running)
+    assert most > 1
+
+
+def test_jobs_limit_concurrency(tmp_path, fake_moss, monkeypatch):
+    monkeypatch.setenv('MOSS_DELAY', '0.2')
+    list(moss.run(_tasks(tmp_path, 4), [], jobs=1, backoff=0))
+    events = [event for event, _, _ in _calls(fake_moss)]
+    assert events == ['start', 'end'] * 4
+
+
+def test_failed_calls_are_retried(tmp_path, fake_moss, monkeypatch):
+    monkeypatch.setenv('MOSS_FAILS', '2')
+    [(_, url, report)] = moss.run(_tasks(tmp_path, 1), [], retries=2,
+                                  backoff=0)
+    assert url and report
+    assert len([c for c in _calls(fake_moss) if c[0] == 'start']) == 3
+
+
+def test_calls_give_up_after_retries(tmp_path, fake_moss, monkeypatch):
+    monkeypatch.setenv('MOSS_FAILS', '5')
+    [(_, url, report)] = moss.run(_tasks(tmp_path, 1), [], retries=1,
+                                  backoff=0)
+    assert (url, report) == (None, '')
+    assert len([c for c in _calls(fake_moss) if c[0] == 'start']) == 2
+
+
+def test_failed_downloads_are_retried(tmp_path, fake_moss, server):
+    server.fails = 2
+    [(_, url, report)] = moss.run(_tasks(tmp_path, 1), [], retries=2,
+                                  backoff=0)
+    assert url and report
+    assert len(server.requests) == 3
@@ -0,0 +1,34 @@
+import moodle.store
+import process
+import winnowing
+
+
+CODE = ['x = int(input())\nprint(2 * x)\n', 'y = int(input())\nprint(y + y)\n']
+REPORTS = {
+    'participants': {},
+    'quiz.grades': moodle.store.Store(),
+    'quiz.responses': {
+        s_id: {'Name': name, 'L1': {q: {'attempt': code, 'answer': ''}
+                                    for q in ('1', '2')}}
+        for s_id, name, code in [('190000001', 'Ana', CODE[0]),
+                                 ('190000002', 'Bob', CODE[1])]}}
+
+
+def test_run_MOSS_retries_questions_without_report(tmp_path, monkeypatch):
+    report, calls = winnowing.report, []
+
+    def flaky_report(path, moss_report, ext):  # Q2 falha na primeira vez.
+        calls.append(path[-2:])
+        return (calls.count('Q2') > 1 or path.endswith('Q1')) and report(
+            path, moss_report, ext)
+
+    monkeypatch.setattr(winnowing, 'report', flaky_report)
+    output = str(tmp_path)
+    for _ in range(3):
+        manifest = process._read_manifest(output)
+        process._run_MOSS(REPORTS, output, 'py', [], 30, {'a': '1'},
+                          manifest, local=True)
+        process._write_manifest(output, manifest)
+
+    assert calls == ['Q1', 'Q2', 'Q2']
+    assert manifest['L1/Q2']['report'] == 'moss.quiz.L1.Q2.html'
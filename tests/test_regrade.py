@@ -0,0 +1,63 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import moodle.quiz.responses
+import regrade
+
+
+RESPONSES = {
+    '190000001': {'Name': 'Ana Maria',
+                  'L1': {'1': {'attempt': 'x = 1\n\nprint(x)\n',
+                               'answer': 'print(1)\n'}}},
+    '190000002': {'Name': 'Bob',
+                  'L1': {'1': {'attempt': '# c\nprint(2)\n',
+                               'answer': 'print(1)\n'}}}}
+EXPECTED = {'190000001': ('Ana Maria', 'x = 1\n\nprint(x)\n'),
+            '190000002': ('Bob', '# c\nprint(2)\n')}
+
+
+@pytest.mark.parametrize('ext', ['py', 'c', 'txt'])
+@pytest.mark.parametrize('extra', [{}, {'190000001': {'L1': {'1': [
+    'Turma A', '50.00%']}}}])
+def test_submissions_strip_the_header(tmp_path, ext, extra):
+    moodle.quiz.responses.write(RESPONSES, str(tmp_path), ext, [], extra)
+    q_dir = tmp_path / 'L1' / 'Q1'
+    (q_dir / 'notes.md').write_text('not a submission')
+    assert regrade.submissions(str(q_dir), ext) == EXPECTED
+
+
+def test_submissions_from_zip(tmp_path):
+    moodle.quiz.responses.write(RESPONSES, str(tmp_path), 'py', [], {},
+                                archive=True)
+    [zip_file] = (tmp_path / 'L1').glob('*.zip')
+    assert regrade.submissions(str(zip_file)) == EXPECTED
+
+
+QUESTION = '''<question type="coderunner">
+  <name><text>Dobro</text></name>
+  <coderunnertype>{type}</coderunnertype>
+  <answer>print(1)</answer>
+  <testcases>
+    <testcase><testcode><text></text></testcode>
+      <stdin><text></text></stdin>
+      <expected><text>1</text></expected></testcase>
+  </testcases>
+</question>'''
+
+
+def test_regrade(tmp_path):
+    moodle.quiz.responses.write(RESPONSES, str(tmp_path), 'py', [], {})
+    question = ET.fromstring(QUESTION.format(type='python3'))
+    grades = regrade.regrade(question, str(tmp_path / 'L1' / 'Q1'),
+                             jobs=1, warm=False, cache_file=None)
+    assert grades == {'190000001': {'Name': 'Ana Maria', 'L1': {'1': 1.0}},
+                      '190000002': {'Name': 'Bob', 'L1': {'1': 0.0}}}
+
+
+def test_regrade_unknown_type(tmp_path):
+    moodle.quiz.responses.write(RESPONSES, str(tmp_path), 'py', [], {})
+    question = ET.fromstring(QUESTION.format(type='python3_unknown'))
+    with pytest.raises(ValueError, match='python3_unknown'):
+        regrade.regrade(question, str(tmp_path / 'L1' / 'Q1'), jobs=1,
+                        warm=False, cache_file=None)
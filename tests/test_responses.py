@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+import moodle.quiz.responses
+
+
+def test_write_archives_removes_temporary_files(tmp_path):
+    def entries():
+        for q in ('1', '2'):
+            yield str(tmp_path / 'L1' / f'Q{q}'), '190000001.py', 'print(1)'
+        raise OSError('No space left on device')
+
+    with pytest.raises(OSError, match='No space'):
+        moodle.quiz.responses._write_archives(entries())
+    assert os.listdir(tmp_path / 'L1') == []
+
+
+def test_write_archives_keeps_unchanged(tmp_path):
+    entries = [(str(tmp_path / 'Q1'), '190000001.py', 'print(1)')]
+    assert moodle.quiz.responses._write_archives(entries) == (
+        1, 1, {str(tmp_path / 'Q1.zip')})
+    assert moodle.quiz.responses._write_archives(entries, True)[:2] == (1, 0)
+    assert os.listdir(tmp_path) == ['Q1.zip']
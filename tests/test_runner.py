@@ -0,0 +1,193 @@
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import checklist
+import runner
+
+
+CODERUNNER = os.path.dirname(runner.__file__)
+PROTOTYPES = runner.prototypes(os.path.join(CODERUNNER,
+                                            'python3_try_except.xml'))
+BANK = {  # unittest.xml question: (tests passed, tests), except 'Has
+    # MemoryLimit' (10 MB, where the interpreter runs out of CPU time).
+    'Gabarito': (10, 10), 'All-or-nothing grading': (10, 10),
+    'Precheck disabled': (10, 10), 'Wrong Feedback': (10, 10),
+    'Wrong Penalty regime': (10, 10), 'Wrong Question Type': (10, 10),
+    'No Feedback': (10, 10), 'No title in questiontext': (10, 10),
+    'SPAN in questiontext': (10, 10),
+    'Wrong format for title in questiontext': (10, 10),
+    'Wrong title in questiontext': (10, 10), 'Has template': (10, 10),
+    'Has TimeLimit': (10, 10), 'No Answer': (0, 10),
+    'No validate on save': (10, 10), 'More than 10 tests': (13, 13),
+    'Only one example': (10, 10), 'Only one hidden': (10, 10),
+    'Only one test': (0, 1), 'Only one visible': (10, 10),
+    'Wrong grades': (10, 10), 'Multiple tags': (10, 10),
+    'No level tags': (10, 10), 'No tags': (10, 10), 'Wrong tags': (10, 10)}
+
+
+@pytest.fixture(scope='module')
+def worker():
+    with runner.Worker() as worker:
+        yield worker
+
+
+def bank():
+    return {question.findtext('name/text'): question
+            for question in ET.parse(os.path.join(CODERUNNER,
+                                                  'unittest.xml')).getroot()
+            if checklist._is_coderunner(question)}
+
+
+@pytest.mark.parametrize('template, context, expected', [
+    ('{{ x }}', {'x': 1}, '1'),
+    ('{{ x.y }}|{{ x["y"] }}|{{ z }}', {'x': {'y': 'a'}}, 'a|a|'),
+    ('{% for i in xs %}{{ loop.index }}{{ i }}{% if not loop.last %},'
+     '{% endif %}{% endfor %}', {'xs': 'ab'}, '1a,2b'),
+    ('{% for i in xs %}{{ i }}{% else %}none{% endfor %}', {'xs': []},
+     'none'),
+    ('{% if x == 1 %}a{% elseif x > 1 and x < 3 %}b{% else %}c{% endif %}',
+     {'x': 2}, 'b'),
+    ('{{ s | e("py") }}', {'s': 'a"b\'c\\'}, 'a\\"b\\\'c\\\\'),
+    ('{{ s | e }}|{{ s | raw }}', {'s': '<a>'}, '&lt;a&gt;|<a>'),
+    ('{{ s | trim | upper }}{{ s | length }}', {'s': ' ab '}, 'AB4'),
+    ('{{ x | default("d") }}{{ xs | json_encode }}', {'xs': [1]}, 'd[1]'),
+    ('{{ "a" ~ x ~ 1 }}', {'x': True}, 'a11'),
+    ('{# comment #}a\n{% if true %}\nb\n{% endif %}\n', {}, 'a\nb\n'),
+    ('a  {{- x -}}  b', {'x': 1}, 'a1b')])
+def test_render(template, context, expected):
+    assert runner.render(template, context) == expected
+
+
+@pytest.mark.parametrize('template, error', [
+    ('{% set x = 1 %}', 'Unsupported Twig tag'),
+    ('{{ x | sort }}', 'Unsupported Twig filter'),
+    ('{% if x %}', 'Unclosed Twig tag'),
+    ('{{ x + 1 }}', 'Unsupported Twig expression'),
+    ('{% endfor %}', 'Unsupported Twig tag')])
+def test_render_unsupported(template, error):
+    with pytest.raises(ValueError, match=error):
+        runner.render(template, {})
+
+
+@pytest.mark.parametrize('grader, got, expected, passed', [
+    ('EqualityGrader', '1 \r\n2\n\n', '1\n2', True),
+    ('EqualityGrader', '1\n 2', '1\n2', False),
+    ('EqualityGrader', 'A', 'a', False),
+    ('NearEqualityGrader', ' A  b\n\n C\n', 'a b\nc', True),
+    ('NearEqualityGrader', 'a b', 'ab', False),
+    ('RegexGrader', 'x = 42\n', r'^x = \d+$', True),
+    ('RegexGrader', 'x = y\n', r'^x = \d+$', False)])
+def test_graders(grader, got, expected, passed):
+    assert runner.GRADERS[grader](got, expected) is passed
+
+
+@pytest.mark.parametrize('name', BANK)
+def test_run_bank(worker, name):
+    grade, results = runner.run(bank()[name], prototypes=PROTOTYPES,
+                                worker=worker)
+    passed, total = BANK[name]
+    assert (sum(p for _, p in results), len(results)) == (passed, total)
+    assert grade == passed / total
+
+
+def test_run_wrong_answer(worker):
+    question = bank()['Gabarito']
+    grade, results = runner.run(question, 'print(1)', PROTOTYPES,
+                                worker=worker)
+    marks = [float(test['mark']) for test in runner.testcases(question)]
+    assert grade == marks[0] / sum(marks)
+    assert [p for _, p in results] == [True] + [False] * 9
+
+    grade, results = runner.run(question, 'print(1 / 0)', PROTOTYPES,
+                                worker=worker)
+    assert grade == 0.0
+    assert results[0][0].startswith('*** Answer Error! ***\nLine: 1\n')
+
+
+def test_run_unknown_type():
+    question = bank()['Gabarito']
+    question.find('coderunnertype').text = 'python3_unknown'
+    with pytest.raises(ValueError, match='python3_unknown'):
+        runner.run(question, prototypes=PROTOTYPES)
+    with pytest.raises(ValueError, match='python3_unknown'):
+        runner.check(question, PROTOTYPES)
+
+
+@pytest.mark.parametrize('warm', [True, False])
+def test_worker_runs_without_fork(monkeypatch, warm):
+    if warm and not runner.WARM:
+        pytest.skip('warm workers not supported')
+    monkeypatch.setattr(runner, 'WARM', warm)
+    with runner.Worker() as worker:
+        assert (worker._process is not None) == warm
+        assert worker.execute('print(input() * 2)', 'ab\n') == ('abab\n', '')
+
+
+def test_worker_low_memory_limit_runs_cold(worker):
+    code = 'import os\nprint(os.getppid())\n'
+    if runner.WARM:
+        assert worker.execute(code) == (f'{worker._process.pid}\n', '')
+    assert worker.execute(code, mem_limit=runner.WARM_MEM_LIMIT - 1) == (
+        f'{os.getpid()}\n', '')
+
+
+def test_run_memlimitmb_runs_cold(worker):
+    question = bank()['Gabarito']
+    question.find('memlimitmb').text = str(runner.WARM_MEM_LIMIT - 1)
+    _, results = runner.run(question, 'import os\nprint(os.getppid())\n',
+                            PROTOTYPES, worker=worker)
+    assert {got for got, _ in results} == {f'{os.getpid()}\n'}
+
+
+def test_cache_run(tmp_path, worker):
+    question = bank()['Gabarito']
+    with runner.Cache(str(tmp_path / 'cache.sqlite')) as cache:
+        first = runner.run(question, prototypes=PROTOTYPES, worker=worker,
+                           cache=cache)
+        misses = cache.misses
+        assert (cache.hits, misses) == (0, 10)
+        assert runner.run(question, prototypes=PROTOTYPES, worker=worker,
+                          cache=cache) == first
+        assert (cache.hits, cache.misses) == (10, misses)
+
+        prototype = PROTOTYPES['python3_try_except']
+        changed = {'python3_try_except': {
+            **prototype, 'template': f'# Changed.\n{prototype["template"]}'}}
+        assert runner.run(question, prototypes=changed, worker=worker,
+                          cache=cache) == first
+        assert (cache.hits, cache.misses) == (10, 2 * misses)
+
+
+def test_cache_error_matches_fresh_run(tmp_path):
+    code = 'print(__file__)\n1 / 0\n'
+    with runner.Cache(str(tmp_path / 'cache.sqlite')) as cache:
+        fresh = cache.execute(runner.execute, code)
+        assert cache.execute(runner.execute, code) == fresh
+        assert cache.hits == 1
+    assert fresh == runner.execute(code)
+    assert fresh[0] == 'prog.py\n' and 'File "prog.py"' in fresh[1]
+
+
+def test_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    import itertools
+    import time
+
+    def run_code(code, *args):
+        runs.append(code)
+        return 'x' * 100, ''
+
+    runs, clock = [], itertools.count()
+    monkeypatch.setattr(time, 'time', lambda: next(clock))
+    file = str(tmp_path / 'cache.sqlite')
+    with runner.Cache(file, max_size=250 / 2**20) as cache:  # 2 entries.
+        for code in 'abca':
+            cache.execute(run_code, code)
+    assert runs == ['a', 'b', 'c']
+
+    with runner.Cache(file) as cache:
+        for code in 'acb':
+            cache.execute(run_code, code)
+        assert (cache.hits, cache.misses) == (2, 1)
+    assert runs == ['a', 'b', 'c', 'b']
@@ -0,0 +1,50 @@
+import random
+
+import winnowing
+
+
+STATEMENTS = ('x = {a} + y * {b}', 'if x > {a}:\n    y -= {b}',
+              'for i in range({a}):\n    x += i % {b}',
+              'while x < {a}:\n    x = x * {b} + 1',
+              'print(x, y, "{a}")', 'y = [k for k in range({a}) if k > x]',
+              'def f{a}(v):\n    return v * {b}', 'x = abs(y - {a})',
+              'try:\n    y = x // {b}\nexcept ZeroDivisionError:\n    y = 0')
+
+
+def programs(count, seed=1):
+    """Returns count random (mostly dissimilar) programs."""
+    rng = random.Random(seed)
+    return [f'x, y = {i}, 1\n' + '\n'.join(
+                rng.choice(STATEMENTS).format(a=rng.randint(1, 99),
+                                              b=rng.randint(1, 9))
+                for _ in range(rng.randint(15, 30))) + '\n'
+            for i in range(count)]
+
+
+def copy_group_sources(files=20, copies=3):
+    sources = {f'{i:03}.py': code for i, code in enumerate(programs(files))}
+    copied = programs(1, seed=99)[0]
+    sources.update({f'copy{i}.py': copied for i in range(copies)})
+    return sources
+
+
+def test_copy_group_is_reported():
+    pairs = winnowing.compare(copy_group_sources())
+    assert {(f1, f2) for f1, _, f2, _, _ in pairs[:3]} == {
+        ('copy0.py', 'copy1.py'), ('copy0.py', 'copy2.py'),
+        ('copy1.py', 'copy2.py')}
+    assert all(p1 == p2 >= 50 for _, p1, _, p2, _ in pairs[:3])
+
+
+def test_hashes_common_to_the_collection_are_dropped():
+    sources = copy_group_sources(copies=winnowing.MAX_COUNT + 1)
+    assert not any(f1.startswith('copy') and f2.startswith('copy')
+                   for f1, _, f2, _, _ in winnowing.compare(sources))
+
+
+def test_base_hashes_are_dropped():
+    sources = copy_group_sources()
+    sources['CORRECT.py'] = sources['copy0.py']
+    assert not any(f1.startswith('copy') and f2.startswith('copy')
+                   for f1, _, f2, _, _ in winnowing.compare(
+                       sources, base=['CORRECT.py']))